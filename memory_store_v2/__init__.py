@@ -4,7 +4,7 @@ Combines all managers into a single interface.
 """
 from typing import Dict, Any
 from .core.database import Database
-from .core.file_store import FileStore
+from .core.file_store import FileStore, MemoryFileStore
 from .managers.session_manager import SessionManager
 from .managers.task_manager import TaskManager
 from .managers.memory_manager import MemoryManager
@@ -15,15 +15,22 @@ from .managers.progress_tracker import ProgressTracker
 class MemorySystemV2:
     """Unified memory system with hierarchical management."""
     
-    def __init__(self, base_dir: str = "./memory_store_v2"):
+    def __init__(self, base_dir: str = "./memory_store_v2", fast_unsafe: bool = False):
         """
         Initialize the memory system.
         
         Args:
-            base_dir: Base directory for storage
+            base_dir: Base directory for storage, or ":memory:" to keep the
+                database and snapshots in memory (nothing touches disk)
+            fast_unsafe: Never fsync the database; a crash can lose or corrupt
+                it, so only use this for disposable test stores
         """
-        self.db = Database(f"{base_dir}/memory.db")
-        self.file_store = FileStore(f"{base_dir}/snapshots")
+        if base_dir == ":memory:":
+            self.db = Database(":memory:", fast_unsafe=fast_unsafe)
+            self.file_store = MemoryFileStore()
+        else:
+            self.db = Database(f"{base_dir}/memory.db", fast_unsafe=fast_unsafe)
+            self.file_store = FileStore(f"{base_dir}/snapshots")
         
         # Initialize managers
         self.sessions = SessionManager(self.db)
@@ -45,14 +52,11 @@ class MemorySystemV2:
         Returns:
             Dictionary with stats
         """
-        sessions = self.db.fetch_all("SELECT COUNT(*) as count FROM sessions")[0]['count']
-        tasks = self.db.fetch_all("SELECT COUNT(*) as count FROM tasks")[0]['count']
-        checkpoints = self.db.fetch_all("SELECT COUNT(*) as count FROM checkpoints")[0]['count']
-        long_term = self.db.fetch_all("SELECT COUNT(*) as count FROM long_term_memory")[0]['count']
-        
-        return {
-            "sessions": sessions,
-            "tasks": tasks,
-            "checkpoints": checkpoints,
-            "long_term_memory": long_term
-        }
+        # All four counts in one statement and one round trip
+        return self.db.fetch_one("""
+            SELECT
+                (SELECT COUNT(*) FROM sessions) AS sessions,
+                (SELECT COUNT(*) FROM tasks) AS tasks,
+                (SELECT COUNT(*) FROM checkpoints) AS checkpoints,
+                (SELECT COUNT(*) FROM long_term_memory) AS long_term_memory
+        """)
@@ -2,19 +2,23 @@
 Dependency mapper agent - analyzes and manages task dependencies
 Enhanced with smart inference, cycle detection/resolution, and visualization support.
 """
+import asyncio
 import json
+import logging
 import uuid
+from graphlib import TopologicalSorter, CycleError
 from typing import Dict, Any, List, Set, Optional, Tuple
-from collections import deque
 from .base_agent import AgentBase
 
+logger = logging.getLogger(__name__)
+
 try:
     import networkx as nx
     from networkx import DiGraph, Graph
     HAS_NETWORKX = True
 except ImportError:
     HAS_NETWORKX = False
-    print("Warning: networkx not installed. Using fallback implementation.")
+    logger.warning("networkx not installed. Using fallback implementation.")
 
 
 class DependencyMapperAgent(AgentBase):
@@ -91,12 +95,15 @@ class DependencyMapperAgent(AgentBase):
             self.dependency_graph = {}
         
         self._build_graph_from_tree(task_tree)
+        # Yield between phases so callers polling get_order/get_graph see partial results
+        await asyncio.sleep(0)
         
         if auto_infer:
             inferred = self._infer_implicit_dependencies(task_tree)
             for dep in inferred:
                 task_id, depends_on = dep
                 self.add_explicit_dependency(task_id, depends_on)
+            await asyncio.sleep(0)
         
         cycles = self.detect_circular_dependencies(session_id, root_task_id)
         if cycles:
@@ -121,6 +128,7 @@ class DependencyMapperAgent(AgentBase):
                 "UPDATE tasks SET metadata = ? WHERE task_id = ?",
                 (json.dumps(metadata), root_task_id)
             )
+            self.task_manager.touch()
         
         return result
     
@@ -141,9 +149,16 @@ class DependencyMapperAgent(AgentBase):
                 "UPDATE tasks SET dependencies = ? WHERE task_id = ?",
                 (json.dumps(deps), task_id)
             )
+            self.task_manager.touch()
     
     def _build_graph_from_tree(self, task_tree: Dict[str, Any]):
         """Recursively build dependency graph from task tree."""
+        # Session-level tree from get_tree() without a root task
+        if 'main_tasks' in task_tree:
+            for main_task in task_tree['main_tasks']:
+                self._build_graph_from_tree(main_task)
+            return
+        
         task_id = task_tree['task_id']
         
         if HAS_NETWORKX:
@@ -225,14 +240,16 @@ class DependencyMapperAgent(AgentBase):
     
     def detect_circular_dependencies(self, session_id: str, 
                                       root_task_id: str = None) -> List[List[str]]:
-        if not HAS_NETWORKX:
-            return self._detect_cycles_fallback()
-        
         task_tree = self.task_manager.get_tree(session_id, root_task_id)
-        if not task_tree:
+        if task_tree:
+            self._build_graph_from_tree(task_tree)
+        
+        # Cheap acyclicity check first - only enumerate cycles when one exists
+        if self._is_acyclic():
             return []
         
-        self._build_graph_from_tree(task_tree)
+        if not HAS_NETWORKX:
+            return self._detect_cycles_fallback()
         
         try:
             cycles = list(nx.simple_cycles(self.dependency_graph))
@@ -242,6 +259,21 @@ class DependencyMapperAgent(AgentBase):
         except nx.NetworkXNoCycle:
             return []
     
+    def _is_acyclic(self) -> bool:
+        """Check the current graph for cycles without enumerating them."""
+        if HAS_NETWORKX:
+            return nx.is_directed_acyclic_graph(self.dependency_graph)
+        
+        sorter = TopologicalSorter({
+            node: data.get('incoming', set())
+            for node, data in self.dependency_graph.items()
+        })
+        try:
+            sorter.prepare()
+        except CycleError:
+            return False
+        return True
+    
     def _find_all_cycles(self) -> List[List[str]]:
         if not HAS_NETWORKX:
             return self._detect_cycles_fallback()
@@ -380,21 +412,24 @@ class DependencyMapperAgent(AgentBase):
         if not self.dependency_graph:
             return []
         
-        in_degree = {}
-        for node in self.dependency_graph:
-            in_degree[node] = len(self.dependency_graph.get(node, {}).get('incoming', set()))
+        sorter = TopologicalSorter({
+            node: data.get('incoming', set())
+            for node, data in self.dependency_graph.items()
+        })
+        try:
+            sorter.prepare()
+        except CycleError:
+            # Still emit every node that is not blocked behind a cycle
+            pass
         
-        queue = deque([n for n in in_degree if in_degree[n] == 0])
+        # Mark nodes done as they are emitted so newly freed nodes come out online
         result = []
-        
-        while queue:
-            node = queue.popleft()
-            result.append(node)
-            
-            for neighbor in self.dependency_graph.get(node, {}).get('outgoing', set()):
-                in_degree[neighbor] -= 1
-                if in_degree[neighbor] == 0:
-                    queue.append(neighbor)
+        ready = sorter.get_ready()
+        while ready:
+            for node in ready:
+                result.append(node)
+                sorter.done(node)
+            ready = sorter.get_ready()
         
         return result
     
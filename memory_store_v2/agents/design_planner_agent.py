@@ -82,6 +82,7 @@ class DesignPlannerAgent(AgentBase):
             "UPDATE tasks SET metadata = ? WHERE task_id = ?",
             (json.dumps(metadata), task_id)
         )
+        self.task_manager.touch()
         
         return {"hld": hld, "task_id": task_id}
     
@@ -108,6 +109,7 @@ class DesignPlannerAgent(AgentBase):
             "UPDATE tasks SET metadata = ? WHERE task_id = ?",
             (json.dumps(metadata), task_id)
         )
+        self.task_manager.touch()
         
         return {"lld": lld, "task_id": task_id}
     
@@ -37,6 +37,7 @@ class IntegrationAgent(AgentBase):
             "UPDATE tasks SET metadata = ? WHERE task_id = ?",
             (json.dumps(metadata), task_id)
         )
+        self.task_manager.touch()
         
     async def validate_integration(self, source_task: str, target_task: str, data: Dict):
         """Validate data against both tasks' contracts"""
@@ -4,6 +4,7 @@ Manages task workflow with parallel execution, dependency tracking, and progress
 FIXED: _flatten_tasks now only executes leaf nodes, not parent containers
 """
 import asyncio
+import logging
 import uuid
 import json
 import time
@@ -15,6 +16,8 @@ from .dependency_mapper_agent import DependencyMapperAgent
 from .parallel_execution_agent import ParallelExecutionAgent
 from .integration_agent import IntegrationAgent
 
+logger = logging.getLogger(__name__)
+
 
 class TaskStatus(Enum):
     PENDING = "pending"
@@ -39,14 +42,14 @@ class WorkflowEvent(Enum):
 class OrchestrationEngine:
     """Central orchestration engine for managing task workflows."""
     
-    def __init__(self, task_manager, max_parallel: int = 4):
+    def __init__(self, task_manager, max_parallel: int = 4, work_stealing: bool = False):
         self.task_manager = task_manager
         self.max_parallel = max_parallel
         
         # Initialize agents
         self.decomposition_agent = TaskDecompositionAgent(task_manager)
         self.dependency_agent = DependencyMapperAgent(task_manager)
-        self.execution_agent = ParallelExecutionAgent(task_manager, max_parallel)
+        self.execution_agent = ParallelExecutionAgent(task_manager, max_parallel, work_stealing)
         self.integration_agent = IntegrationAgent(task_manager)
         
         # Workflow state
@@ -322,4 +325,4 @@ class OrchestrationEngine:
                 else:
                     handler(data)
             except Exception as e:
-                print(f"Event handler error: {e}")
+                logger.error(f"Event handler error: {e}")
@@ -4,15 +4,18 @@ Enhanced with real task execution hooks, dynamic parallelism, and resource manag
 """
 import asyncio
 import json
+import logging
 import time
 import uuid
-from typing import Dict, Any, List, Set, Optional, Callable
-from enum import Enum
 from collections import deque
+from typing import Dict, Any, List, Set, Optional, Callable, Tuple
+from enum import Enum
 from heapq import heappush, heappop
 
 from .base_agent import AgentBase
 
+logger = logging.getLogger(__name__)
+
 
 class ExecutionState(Enum):
     IDLE = "idle"
@@ -33,17 +36,20 @@ class ParallelExecutionAgent(AgentBase):
     - Resource-aware scheduling
     - Deadlock detection and recovery
     - Execution history and statistics
+    - Optional work stealing: idle workers pull the next ready task instead of
+      waiting for a fixed-size wave to finish
     """
     
-    def __init__(self, task_manager, max_parallel: int = 4):
+    def __init__(self, task_manager, max_parallel: int = 4, work_stealing: bool = False):
         super().__init__("parallel_executor")
         self.task_manager = task_manager
         self.max_parallel = max_parallel
+        self.work_stealing = work_stealing
         self.min_parallel = 1
         
         # Execution state
         self.currently_running: Dict[str, Dict] = {}
-        self.task_queue: deque = deque()
+        self.task_queue: List[Tuple[int, str]] = []  # heap of (-priority, task_id)
         self.execution_history: List[Dict] = []
         self.execution_stats = {
             'total_executed': 0,
@@ -111,7 +117,7 @@ class ParallelExecutionAgent(AgentBase):
         self._progress_callback = callback
     
     async def schedule_tasks(self, session_id: str, root_task_id: str = None,
-                              max_parallel: int = None) -> Dict:
+                              max_parallel: int = None, work_stealing: bool = None) -> Dict:
         """
         Schedule tasks for parallel execution.
         
@@ -119,17 +125,92 @@ class ParallelExecutionAgent(AgentBase):
             session_id: Session ID
             root_task_id: Optional root task ID
             max_parallel: Override max parallel tasks
+            work_stealing: Override work stealing mode
             
         Returns:
             Schedule result
         """
         if max_parallel:
             self.max_parallel = max_parallel
+        if work_stealing is not None:
+            self.work_stealing = work_stealing
         
         task_tree = self.task_manager.get_tree(session_id, root_task_id)
         if not task_tree:
             return {'status': 'error', 'message': 'Task tree not found'}
         
+        return await self._schedule_tree(task_tree)
+    
+    async def schedule_independent(self, session_id: str, root_task_id: str = None,
+                                   max_parallel: int = None, work_stealing: bool = None) -> Dict:
+        """
+        Schedule tasks, short-circuiting when no task has dependencies.
+        
+        With no dependency edges there is nothing to order, so every task is
+        started at once under a max_parallel semaphore instead of going through
+        the priority queue and fixed-size waves. Falls back to the full
+        scheduler otherwise.
+        
+        Args:
+            session_id: Session ID
+            root_task_id: Optional root task ID
+            max_parallel: Override max parallel tasks
+            work_stealing: Override work stealing mode
+            
+        Returns:
+            Schedule result
+        """
+        if max_parallel:
+            self.max_parallel = max_parallel
+        if work_stealing is not None:
+            self.work_stealing = work_stealing
+        
+        task_tree = self.task_manager.get_tree(session_id, root_task_id)
+        if not task_tree:
+            return {'status': 'error', 'message': 'Task tree not found'}
+        
+        if 'task_id' not in task_tree or self._has_dependencies(task_tree):
+            return await self._schedule_tree(task_tree)
+        
+        async with self._state_lock:
+            if self._execution_state == ExecutionState.RUNNING:
+                return {'status': 'error', 'message': 'Execution already in progress'}
+            
+            self._execution_state = ExecutionState.RUNNING
+        
+        self._semaphore = asyncio.Semaphore(self.max_parallel)
+        self._paused_permits_held = 0
+        
+        start_time = time.time()
+        task_ids = self._calculate_execution_order(task_tree)
+        
+        async def run_with_hooks(task_id: str) -> Dict:
+            async with self._semaphore:
+                return await self._execute_with_hooks(task_id)
+        
+        results = await asyncio.gather(
+            *(run_with_hooks(task_id) for task_id in task_ids),
+            return_exceptions=True
+        )
+        
+        return await self._finish_execution(task_ids, list(results), start_time)
+    
+    @staticmethod
+    def _has_dependencies(task_tree: Dict[str, Any]) -> bool:
+        """Check whether any task in the tree declares a dependency."""
+        stack = [task_tree]
+        while stack:
+            task = stack.pop()
+            deps = task.get('dependencies')
+            if isinstance(deps, str):
+                deps = json.loads(deps) if deps else []
+            if deps:
+                return True
+            stack.extend(task.get('subtasks', []))
+        return False
+    
+    async def _schedule_tree(self, task_tree: Dict[str, Any]) -> Dict:
+        """Run the full priority-queue scheduler over a task tree."""
         async with self._state_lock:
             if self._execution_state == ExecutionState.RUNNING:
                 return {'status': 'error', 'message': 'Execution already in progress'}
@@ -205,6 +286,10 @@ class ParallelExecutionAgent(AgentBase):
             _, task_id = heappop(self.task_queue)
             tasks_to_process.append(task_id)
         
+        if self.work_stealing:
+            results = await self._run_work_stealing(tasks_to_process)
+            return await self._finish_execution(tasks_to_process, results, start_time)
+        
         # Create execution tasks
         async def run_with_hooks(task_id: str) -> Dict:
             async with self._semaphore:
@@ -230,6 +315,79 @@ class ParallelExecutionAgent(AgentBase):
             except Exception as e:
                 results.extend([{'error': str(e)}] * len(batch))
         
+        return await self._finish_execution(tasks_to_process, results, start_time)
+    
+    async def _run_work_stealing(self, task_ids: List[str]) -> List[Dict]:
+        """
+        Run tasks on a pool of max_parallel workers fed from a ready deque.
+        
+        A task becomes ready once every queued task it depends on has finished;
+        each completion pushes newly unblocked dependents onto the deque, so a
+        worker never idles while runnable work exists. Dependencies outside the
+        queue are ignored, and if only a cycle remains its earliest task is
+        released so the run still drains.
+        
+        Args:
+            task_ids: Task IDs in queue (priority) order
+            
+        Returns:
+            Results in the same order as task_ids
+        """
+        queued = set(task_ids)
+        waiting: Dict[str, int] = {}
+        dependents: Dict[str, List[str]] = {task_id: [] for task_id in task_ids}
+        
+        tasks = self.task_manager.get_many(task_ids)
+        for task_id in task_ids:
+            task = tasks.get(task_id)
+            deps = json.loads(task.get('dependencies') or '[]') if task else []
+            deps = [d for d in dict.fromkeys(deps) if d in queued and d != task_id]
+            waiting[task_id] = len(deps)
+            for dep in deps:
+                dependents[dep].append(task_id)
+        
+        ready = deque(task_id for task_id in task_ids if not waiting[task_id])
+        results: Dict[str, Dict] = {}
+        running = 0
+        changed = asyncio.Condition()
+        
+        async def worker():
+            nonlocal running
+            while True:
+                async with changed:
+                    while not ready:
+                        if len(results) + running == len(task_ids):
+                            return
+                        if running == 0:
+                            # Nothing can unblock the rest - break the cycle
+                            blocked = next(t for t in task_ids if t not in results and waiting[t] > 0)
+                            waiting[blocked] = 0
+                            ready.append(blocked)
+                            break
+                        await changed.wait()
+                    task_id = ready.popleft()
+                    running += 1
+                
+                async with self._semaphore:
+                    result = await self._execute_with_hooks(task_id)
+                
+                async with changed:
+                    running -= 1
+                    results[task_id] = result
+                    for dependent in dependents[task_id]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            ready.append(dependent)
+                    changed.notify_all()
+        
+        workers = min(self.max_parallel, len(task_ids))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        
+        return [results[task_id] for task_id in task_ids]
+    
+    async def _finish_execution(self, task_ids: List[str], results: List[Any],
+                                start_time: float) -> Dict:
+        """Record statistics and build the execution result."""
         execution_time = time.time() - start_time
         
         # Update statistics
@@ -240,11 +398,11 @@ class ParallelExecutionAgent(AgentBase):
         
         return {
             'status': 'completed',
-            'total_tasks': len(tasks_to_process),
+            'total_tasks': len(task_ids),
             'executed': len([r for r in results if not isinstance(r, dict) or 'error' not in r]),
             'failed': len([r for r in results if isinstance(r, dict) and 'error' in r]),
             'execution_time': execution_time,
-            'results': {k: v for k, v in zip(tasks_to_process, results)}
+            'results': {k: v for k, v in zip(task_ids, results)}
         }
     
     async def _execute_with_hooks(self, task_id: str) -> Dict:
@@ -349,7 +507,7 @@ class ParallelExecutionAgent(AgentBase):
             try:
                 await self._progress_callback(task_id, progress, status)
             except Exception as e:
-                print(f"Progress callback error: {e}")
+                logger.error(f"Progress callback error: {e}")
     
     async def pause_execution(self):
         """Pause current execution using non-blocking acquire."""
@@ -423,15 +581,16 @@ class ParallelExecutionAgent(AgentBase):
             return deadlocks
         
         # Check for circular waiting
+        tasks = self.task_manager.get_many(running_tasks)
+        running_deps = {
+            task_id: json.loads(task.get('dependencies', '[]') or '[]')
+            for task_id, task in tasks.items()
+        }
         for i, task1 in enumerate(running_tasks):
-            task1_deps = json.loads(
-                self.task_manager.get(task1).get('dependencies', '[]') or '[]'
-            )
+            task1_deps = running_deps.get(task1, [])
             
             for task2 in running_tasks[i+1:]:
-                task2_deps = json.loads(
-                    self.task_manager.get(task2).get('dependencies', '[]') or '[]'
-                )
+                task2_deps = running_deps.get(task2, [])
                 
                 # Check if task1 is waiting for task2 and vice versa
                 if task1 in task2_deps and task2 in task1_deps:
@@ -506,10 +665,11 @@ class ParallelExecutionAgent(AgentBase):
             deps = json.loads(deps_str) if deps_str else []
             
             # Check if all dependencies are completed
+            dep_tasks = self.task_manager.get_many(deps)
             all_done = all(
-                self.task_manager.get(d).get('status') == 'completed'
+                dep_tasks[d].get('status') == 'completed'
                 for d in deps
-                if self.task_manager.get(d)
+                if d in dep_tasks
             )
             
             if all_done:
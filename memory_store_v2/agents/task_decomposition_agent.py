@@ -74,18 +74,12 @@ class TaskDecompositionAgent(AgentBase):
         task_type = self.classify_task(task)
         complexity = self.analyze_complexity(task)
         subtasks = self.generate_smart_subtasks(task, task_type)
-        created_subtasks = []
-        
-        for subtask in subtasks:
-            subtask_id = self.task_manager.create_subtask(
-                session_id, task_id, subtask['name'],
-                subtask.get('description', ''), subtask.get('priority', 0)
-            )
-            created_subtasks.append(subtask_id)
-            
+        created_subtasks = self.task_manager.create_subtasks(session_id, task_id, subtasks)
+        
+        for i, (subtask, subtask_id) in enumerate(zip(subtasks, created_subtasks)):
             if auto_dependencies and subtask.get('depends_on'):
                 for dep in subtask['depends_on']:
-                    if dep in created_subtasks:
+                    if dep in created_subtasks[:i + 1]:
                         self.task_manager.add_dependency(subtask_id, dep)
         
         metadata = json.loads(task.get('metadata', '{}') or '{}')
@@ -99,6 +93,7 @@ class TaskDecompositionAgent(AgentBase):
             "UPDATE tasks SET metadata = ? WHERE task_id = ?",
             (json.dumps(metadata), task_id)
         )
+        self.task_manager.touch()
         
         return created_subtasks
     
@@ -120,15 +115,7 @@ class TaskDecompositionAgent(AgentBase):
         else:
             subtasks = self.generate_smart_subtasks(task, self.classify_task(task))
         
-        created_subtasks = []
-        for subtask in subtasks:
-            subtask_id = self.task_manager.create_subtask(
-                session_id, task_id, subtask['name'],
-                subtask.get('description', ''), subtask.get('priority', 0)
-            )
-            created_subtasks.append(subtask_id)
-        
-        return created_subtasks
+        return self.task_manager.create_subtasks(session_id, task_id, subtasks)
     
     def classify_task(self, task: Dict[str, Any]) -> str:
         text = f"{task.get('name', '')} {task.get('description', '')}".lower()
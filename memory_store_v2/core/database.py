@@ -5,9 +5,11 @@ Production-ready with proper connection pooling and transaction management.
 import sqlite3
 import json
 import os
+import queue
 import threading
+import uuid
 from contextlib import contextmanager
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,18 +26,43 @@ class Database:
     - Thread-safe connection pooling with max limit
     - Transaction support with rollback on failure
     - WAL mode for concurrent reads
+    - Pool of read-only connections for read-mostly queries
+    - ":memory:" databases on one connection shared by all threads in turn
     - Automatic connection cleanup
     """
     
-    def __init__(self, db_path: str = "./memory_store_v2/memory.db", max_connections: int = 10):
+    # Prepared statements kept per connection, keyed by SQL text - enough for
+    # every distinct query the managers issue, so none is re-parsed
+    STATEMENT_CACHE_SIZE = 256
+    
+    def __init__(self, db_path: str = "./memory_store_v2/memory.db", max_connections: int = 10,
+                 read_pool_size: int = 4, fast_unsafe: bool = False):
         self.db_path = db_path
         self.max_connections = max_connections
         self._connections = {}
         self._lock = threading.Lock()
         self._connection_count = 0
         self._semaphore = threading.Semaphore(max_connections)
-        self._is_memory = db_path == ":memory:" or db_path.startswith("file:")
+        self._is_memory = db_path == ":memory:"
         self._closed = False
+        # An in-memory database lives in a single connection, so every thread
+        # uses that one in turn. Shared-cache connections would take table
+        # locks that busy_timeout does not wait on
+        self._memory_conn: Optional[sqlite3.Connection] = None
+        self._memory_lock = threading.RLock()
+        # In-memory databases are private to one connection, so they get no readers
+        self.read_pool_size = 0 if self._is_memory else read_pool_size
+        self._readers = queue.Queue()
+        self._reader_count = 0
+        self._local = threading.local()
+        # Per-connection settings: none of these persist in the database file.
+        # fast_unsafe skips fsync entirely - for throwaway test databases only
+        self._pragmas = [
+            "PRAGMA synchronous=OFF" if fast_unsafe else "PRAGMA synchronous=NORMAL",
+            "PRAGMA cache_size=-64000",  # 64MB cache
+        ]
+        if fast_unsafe:
+            self._pragmas.append("PRAGMA temp_store=MEMORY")
         self._init_database()
     
     def _init_database(self):
@@ -48,11 +75,13 @@ class Database:
         # Enable WAL mode with initial connection
         conn = sqlite3.connect(
             self.db_path if self.db_path else ":memory:",
-            timeout=30.0
+            timeout=30.0,
+            check_same_thread=False,
+            cached_statements=self.STATEMENT_CACHE_SIZE
         )
         conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
-        conn.execute("PRAGMA cache_size=-64000")  # 64MB cache
+        for pragma in self._pragmas:
+            conn.execute(pragma)
         conn.execute("PRAGMA busy_timeout=30000")
         conn.commit()
         
@@ -154,8 +183,66 @@ class Database:
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_level ON checkpoints(level)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_timestamp ON checkpoints(timestamp)")
         
+        # Composite indexes for the session-scoped tree, status and checkpoint list lookups
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_session_parent ON tasks(session_id, parent_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_session_status ON tasks(session_id, status)")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_checkpoints_session_task_level "
+            "ON checkpoints(session_id, task_id, level, timestamp DESC)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_checkpoints_session_timestamp "
+            "ON checkpoints(session_id, timestamp DESC)"
+        )
+        
+        # Long-term memory is always read per session, newest first, and
+        # deduplicated per session by content hash on every store
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_longterm_session_type "
+            "ON long_term_memory(session_id, memory_type, created_at DESC)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_longterm_session_created "
+            "ON long_term_memory(session_id, created_at DESC)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_longterm_session_hash "
+            "ON long_term_memory(session_id, content_hash)"
+        )
+        
+        # Roll a sub-task's progress and status up into its parent on write,
+        # so reads never aggregate. Triggers do not recurse by default, so
+        # this reaches the direct parent only
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_rollup
+            AFTER UPDATE OF progress, status ON tasks
+            WHEN NEW.parent_id IS NOT NULL
+            BEGIN
+                UPDATE tasks
+                SET progress = (
+                        SELECT COALESCE(AVG(c.progress), 0.0) FROM tasks c
+                        WHERE c.parent_id = NEW.parent_id
+                    ),
+                    status = CASE WHEN EXISTS (
+                        SELECT 1 FROM tasks c
+                        WHERE c.parent_id = NEW.parent_id AND c.status != 'completed'
+                    ) THEN 'in_progress' ELSE 'completed' END,
+                    updated_at = NEW.updated_at
+                WHERE task_id = NEW.parent_id;
+            END
+        """)
+        
+        # Refresh planner statistics so the composite indexes get picked
+        cursor.execute("ANALYZE")
+        
         conn.commit()
-        conn.close()
+        if self._is_memory:
+            # Closing it would drop the database - keep it as the shared connection
+            conn.isolation_level = None
+            conn.row_factory = sqlite3.Row
+            self._memory_conn = conn
+        else:
+            conn.close()
         
         logger.info(f"Database initialized at: {self.db_path}")
     
@@ -175,6 +262,20 @@ class Database:
         if self._closed:
             raise DatabaseError("Database connection pool has been closed")
         
+        # Inside reading() every query on this thread goes to the borrowed reader
+        reader = getattr(self._local, "reader", None)
+        if reader is not None:
+            yield reader
+            return
+        
+        if self._is_memory:
+            # Re-entrant, so nested calls and transaction() on this thread go through
+            with self._memory_lock:
+                if self._closed:
+                    raise DatabaseError("Database connection pool has been closed")
+                yield self._memory_conn
+            return
+        
         thread_id = threading.current_thread().ident
         conn = None
         
@@ -191,12 +292,14 @@ class Database:
                         self.db_path if self.db_path else ":memory:",
                         timeout=30.0,
                         check_same_thread=False,
-                        isolation_level=None  # Let us control transactions
+                        isolation_level=None,  # Let us control transactions
+                        cached_statements=self.STATEMENT_CACHE_SIZE
                     )
                     conn.row_factory = sqlite3.Row
-                    if not self._is_memory:
-                        conn.execute("PRAGMA journal_mode=WAL")
-                        conn.execute("PRAGMA busy_timeout=30000")
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA busy_timeout=30000")
+                    for pragma in self._pragmas:
+                        conn.execute(pragma)
                     self._connections[thread_id] = conn
                     self._connection_count += 1
             
@@ -204,14 +307,124 @@ class Database:
         finally:
             self._semaphore.release()
     
+    def _open_reader(self) -> sqlite3.Connection:
+        """Open a query-only connection for the read pool."""
+        conn = sqlite3.connect(
+            f"file:{os.path.abspath(self.db_path)}?mode=ro",
+            uri=True,
+            timeout=30.0,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+    
+    @contextmanager
+    def reading(self):
+        """
+        Route this thread's queries through a pooled read-only connection.
+        
+        Readers are opened lazily up to read_pool_size and then shared, so
+        read-mostly calls from worker threads run alongside the writer under
+        WAL instead of queueing behind it. Writes inside the block fail.
+        
+        Usage:
+            with db.reading():
+                rows = db.fetch_all("SELECT ...")
+        """
+        if self._closed:
+            raise DatabaseError("Database connection pool has been closed")
+        
+        if not self.read_pool_size or getattr(self._local, "reader", None) is not None:
+            yield
+            return
+        
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._reader_count < self.read_pool_size
+                if can_open:
+                    self._reader_count += 1
+            if can_open:
+                try:
+                    conn = self._open_reader()
+                except Exception:
+                    with self._lock:
+                        self._reader_count -= 1
+                    raise
+            else:
+                try:
+                    conn = self._readers.get(timeout=30.0)
+                except queue.Empty:
+                    raise DatabaseError("Could not acquire read connection within timeout")
+        
+        self._local.reader = conn
+        try:
+            yield
+        finally:
+            self._local.reader = None
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+    
+    def run_read(self, fn, *args, **kwargs):
+        """
+        Call fn with its queries on a pooled read-only connection.
+        
+        Args:
+            fn: Read-only callable, typically a manager method
+            
+        Returns:
+            Whatever fn returns
+        """
+        with self.reading():
+            return fn(*args, **kwargs)
+    
     def execute(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
-        """Execute query and return cursor."""
+        """
+        Execute query and return cursor.
+        
+        Connections run in autocommit mode, so a statement outside a
+        transaction is committed on its own; inside transaction() or an
+        open savepoint it becomes part of that transaction.
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            conn.commit()
             return cursor
     
+    def executemany(self, query: str, rows: List[tuple]) -> sqlite3.Cursor:
+        """Execute one statement for every parameter row in a single transaction."""
+        with self.transaction() as conn:
+            return conn.executemany(query, rows)
+    
+    def bulk_insert(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert many rows with one prepared statement.
+        
+        Args:
+            table: Table name (trusted, not user input)
+            rows: Row dictionaries; all must have the same keys as the first
+            
+        Returns:
+            Number of rows inserted
+        """
+        if not rows:
+            return 0
+        
+        columns = list(rows[0])
+        query = (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        self.executemany(query, [tuple(row[c] for c in columns) for row in rows])
+        return len(rows)
+    
     def fetch_one(self, query: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
         """Fetch single row as dictionary."""
         with self.get_connection() as conn:
@@ -227,6 +440,13 @@ class Database:
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
     
+    def iter_rows(self, query: str, params: tuple = ()) -> Iterator[sqlite3.Row]:
+        """Iterate raw rows straight off the cursor without building dicts."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            yield from cursor
+    
     @contextmanager
     def transaction(self):
         """
@@ -239,6 +459,19 @@ class Database:
                 # Automatically committed if no exception
         """
         with self.get_connection() as conn:
+            if conn.in_transaction:
+                # Nested inside an outer transaction: scope this one to a savepoint
+                name = f"tx_{uuid.uuid4().hex[:8]}"
+                conn.execute(f"SAVEPOINT {name}")
+                try:
+                    yield conn
+                    conn.execute(f"RELEASE {name}")
+                except Exception:
+                    conn.execute(f"ROLLBACK TO {name}")
+                    conn.execute(f"RELEASE {name}")
+                    raise
+                return
+            
             conn.execute("BEGIN")
             try:
                 yield conn
@@ -259,7 +492,18 @@ class Database:
                     logger.warning(f"Error closing connection for thread {thread_id}: {e}")
             self._connections.clear()
             self._connection_count = 0
-            logger.info("Database connection pool closed")
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._reader_count = 0
+        
+        if self._memory_conn is not None:
+            with self._memory_lock:
+                self._memory_conn.close()
+                self._memory_conn = None
+        logger.info("Database connection pool closed")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get database statistics."""
@@ -268,6 +512,7 @@ class Database:
             "is_memory": self._is_memory,
             "max_connections": self.max_connections,
             "active_connections": self._connection_count,
+            "read_connections": self._reader_count,
             "closed": self._closed
         }
     
@@ -2,12 +2,13 @@
 File store for managing JSON snapshot files.
 Handles atomic writes, loading, and cleanup of checkpoint snapshots.
 """
-import json
 import os
 import hashlib
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+from .json_codec import dumps_indented as _encode_snapshot, loads as _loads
+
 
 class FileStore:
     """Manages JSON snapshot files for checkpoints."""
@@ -30,18 +31,34 @@ class FileStore:
         file_path = self.base_dir / f"{checkpoint_id}.json"
         
         # Serialize with proper formatting
-        json_str = json.dumps(data, indent=2, ensure_ascii=False)
+        encoded = _encode_snapshot(data)
         
         # Write atomically using temp file
         temp_path = file_path.with_suffix('.tmp')
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            f.write(json_str)
+        with open(temp_path, 'wb') as f:
+            f.write(encoded)
         
         # Atomic rename
         temp_path.rename(file_path)
         
         return str(file_path)
     
+    def sync(self):
+        """
+        Flush the snapshot directory so completed renames survive a crash.
+        
+        Called once per batch of writes rather than once per snapshot.
+        """
+        if os.name == "nt":
+            # Directories cannot be opened for fsync on Windows
+            return
+        
+        fd = os.open(self.base_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
     def load_snapshot(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
         """
         Load snapshot from JSON file.
@@ -57,8 +74,8 @@ class FileStore:
         if not file_path.exists():
             return None
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(file_path, 'rb') as f:
+            return _loads(f.read())
     
     def delete_snapshot(self, checkpoint_id: str) -> bool:
         """
@@ -127,3 +144,49 @@ class FileStore:
     def list_snapshots(self) -> list:
         """List all snapshot files."""
         return [f.stem for f in self.base_dir.glob("*.json")]
+
+
+class MemoryFileStore(FileStore):
+    """
+    FileStore that keeps serialized snapshots in a dict instead of on disk.
+    
+    Used with in-memory databases; snapshots are encoded exactly as on disk
+    so sizes and hashes match.
+    """
+    
+    def __init__(self):
+        self.base_dir = None
+        self._files: Dict[str, bytes] = {}
+    
+    def save_snapshot(self, data: Dict[str, Any], checkpoint_id: str) -> str:
+        self._files[checkpoint_id] = _encode_snapshot(data)
+        return f"memory:{checkpoint_id}.json"
+    
+    def sync(self):
+        pass
+    
+    def load_snapshot(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._files.get(checkpoint_id)
+        return _loads(raw) if raw is not None else None
+    
+    def delete_snapshot(self, checkpoint_id: str) -> bool:
+        return self._files.pop(checkpoint_id, None) is not None
+    
+    def get_file_info(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._files.get(checkpoint_id)
+        if raw is None:
+            return None
+        return {
+            "size": len(raw),
+            "modified": None,
+            "hash": hashlib.md5(raw).hexdigest()
+        }
+    
+    def cleanup_orphaned(self, valid_checkpoint_ids: set) -> int:
+        orphaned = [cp_id for cp_id in self._files if cp_id not in valid_checkpoint_ids]
+        for cp_id in orphaned:
+            del self._files[cp_id]
+        return len(orphaned)
+    
+    def list_snapshots(self) -> list:
+        return list(self._files)
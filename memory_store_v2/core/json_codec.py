@@ -0,0 +1,56 @@
+"""
+JSON encoding shared by the stores and managers.
+Uses orjson when it is installed, the standard library otherwise.
+"""
+import json
+import re
+from typing import Any, Union
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+_compact = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _indented(value: Any) -> bytes:
+    """Encode with the stdlib as 2-space indented UTF-8 JSON."""
+    return json.dumps(value, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+if HAS_ORJSON:
+    # Non-str keys are stringified, as json.dumps does
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(value: Any) -> str:
+        """Encode a column value as compact JSON text."""
+        try:
+            return orjson.dumps(value, option=_OPTIONS).decode()
+        except TypeError:
+            # orjson rejects valid values such as ints beyond 64 bits
+            return _compact(value)
+
+    def dumps_indented(value: Any) -> bytes:
+        """Encode a snapshot as 2-space indented UTF-8 JSON."""
+        try:
+            return orjson.dumps(value, option=_OPTIONS | orjson.OPT_INDENT_2)
+        except TypeError:
+            return _indented(value)
+
+    # orjson parses ints beyond 64 bits as floats; any run of 19+ digits
+    # might be one, so that text goes to the stdlib parser instead
+    _LONG_DIGITS = re.compile(r"\d{19}")
+    _LONG_DIGITS_BYTES = re.compile(rb"\d{19}")
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """Decode JSON text, keeping big ints exact as json.loads does."""
+        pattern = _LONG_DIGITS_BYTES if isinstance(data, (bytes, bytearray)) else _LONG_DIGITS
+        if pattern.search(data):
+            return json.loads(data)
+        return orjson.loads(data)
+else:
+    dumps = _compact
+    dumps_indented = _indented
+    loads = json.loads
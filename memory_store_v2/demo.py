@@ -209,7 +209,7 @@ def demo():
         print(f"   Time difference: {diff['timestamp_diff']:.2f}s")
         print(f"   Task changes: {len(diff['changes']['tasks'])}")
         for change in diff['changes']['tasks']:
-            print(f"   - {change}")
+            print(f"   - {memory.checkpoints.format_change(change)}")
         
         # 8. Checkpoint Restore
         print_section("8. Checkpoint Restore")
@@ -2,30 +2,64 @@
 Checkpoint manager for multi-level checkpointing.
 Handles overall, subtask, and stage checkpoints with file-based snapshots.
 """
+import itertools
 import time
 import uuid
 import json
 import os
 import hashlib
-from typing import Optional, List, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
 from ..core.database import Database
+from ..core.json_codec import dumps as _dumps
 from ..core.file_store import FileStore
 from .task_manager import TaskManager
 from .memory_manager import MemoryManager
 
 
 class CheckpointManager:
-    """Multi-level checkpoint management."""
+    """
+    Multi-level checkpoint management.
+    
+    Overall checkpoints are written as deltas: only the snapshot sections that
+    changed since the session's previous overall checkpoint are stored, with a
+    pointer to it. Every max_delta_chain-th checkpoint (and the first one in a
+    process) is written in full, so rebuilding one never walks a long chain.
+    
+    When neither tasks nor memory have been written since the session's
+    previous overall checkpoint, its sections are reused instead of being
+    queried and rebuilt again.
+    
+    Parsed snapshot files are kept in a small LRU, so repeated get()/diff()
+    calls and delta chain rebuilds do not re-read and re-parse the same file.
+    Callers must treat returned snapshots as read-only.
+    """
+    
+    # Parsed snapshot files kept per manager
+    SNAPSHOT_CACHE_SIZE = 128
     
     def __init__(self, db: Database, file_store: FileStore,
-                 task_manager: TaskManager, memory_manager: MemoryManager):
+                 task_manager: TaskManager, memory_manager: MemoryManager,
+                 max_delta_chain: int = 10):
         self.db = db
         self.file_store = file_store
         self.task_manager = task_manager
         self.memory_manager = memory_manager
+        self.max_delta_chain = max_delta_chain
+        # session_id -> (checkpoint_id, full snapshot, delta chain depth, state)
+        self._last_overall: Dict[str, Tuple[str, Dict[str, Any], int, Tuple[int, int]]] = {}
+        # Bumped on every write so callers can key caches on the checkpoint store state
+        self.version = 0
+        # Writes come from the writer thread and the event loop; next() on a
+        # count cannot lose an increment the way += can
+        self._versions = itertools.count(1)
+        # checkpoint_id -> snapshot file contents as stored (full or delta)
+        self._stored: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stored_lock = threading.Lock()
     
     def create_overall(self, session_id: str, tags: List[str] = None,
-                      metadata: Dict = None) -> str:
+                      metadata: Dict = None, checkpoint_id: str = None) -> str:
         """
         Create overall session checkpoint.
         
@@ -33,41 +67,116 @@ class CheckpointManager:
             session_id: Session ID
             tags: Optional tags
             metadata: Optional metadata
+            checkpoint_id: Pre-allocated ID (generated if omitted)
             
         Returns:
             Checkpoint ID
         """
-        checkpoint_id = f"cp_{uuid.uuid4().hex[:8]}"
+        checkpoint_id = checkpoint_id or f"cp_{uuid.uuid4().hex[:8]}"
+        
+        row, entry = self._write_overall(session_id, tags, metadata, checkpoint_id,
+                                         self._last_overall.get(session_id))
+        self.db.bulk_insert("checkpoints", [row])
+        self.version = next(self._versions)
+        
+        self._last_overall[session_id] = entry
+        return checkpoint_id
+    
+    def create_many(self, session_id: str,
+                    specs: List[Tuple[Optional[List[str]], Optional[Dict]]]) -> List[str]:
+        """
+        Create several overall session checkpoints in one insert.
+        
+        The session state is captured once and shared by every checkpoint in
+        the batch; each one gets its own tags, metadata and snapshot file.
+        
+        Args:
+            session_id: Session ID
+            specs: (tags, metadata) pairs, one per checkpoint
+            
+        Returns:
+            Checkpoint IDs, in the order of specs
+        """
+        previous = self._last_overall.get(session_id)
+        rows = []
+        for (tags, metadata), checkpoint_id in zip(specs, self._new_ids(len(specs))):
+            row, previous = self._write_overall(session_id, tags, metadata,
+                                                checkpoint_id, previous)
+            rows.append(row)
+        
+        if rows:
+            self.db.bulk_insert("checkpoints", rows)
+            self.version = next(self._versions)
+            self._last_overall[session_id] = previous
+        return [row['checkpoint_id'] for row in rows]
+    
+    @staticmethod
+    def _new_ids(count: int) -> List[str]:
+        """Random IDs in the usual cp_xxxxxxxx form, all from one urandom read."""
+        raw = os.urandom(4 * count).hex()
+        return [f"cp_{raw[i:i + 8]}" for i in range(0, len(raw), 8)]
+    
+    def _write_overall(self, session_id: str, tags: Optional[List[str]], metadata: Optional[Dict],
+                       checkpoint_id: str, previous: Optional[Tuple]) -> Tuple[Dict[str, Any], Tuple]:
+        """
+        Write one overall snapshot file.
+        
+        Args:
+            previous: The session's last overall checkpoint entry, if any
+            
+        Returns:
+            The checkpoints row to insert and the entry that replaces previous
+        """
+        state = (self.task_manager.version, self.memory_manager.version)
         
         # Build snapshot
-        snapshot = {
-            "type": "overall",
-            "session_id": session_id,
-            "timestamp": time.time(),
-            "tasks": self.task_manager.get_tree(session_id),
-            "long_term_memory": self.memory_manager.retrieve_long_term(session_id, limit=50),
-            "short_term_memory": self.memory_manager.get_short_term(session_id),
-            "metadata": metadata or {}
-        }
+        if previous and previous[3] == state:
+            # Nothing captured below has been written since the last one
+            snapshot = dict(previous[1], timestamp=time.time(), metadata=metadata or {})
+        else:
+            tasks = self.task_manager.get_tree(session_id)
+            snapshot = {
+                "type": "overall",
+                "session_id": session_id,
+                "timestamp": time.time(),
+                "tasks": tasks,
+                "merkle": self._merkle_hashes(tasks),
+                "long_term_memory": self.memory_manager.retrieve_long_term(session_id, limit=50),
+                "short_term_memory": self.memory_manager.get_short_term(session_id),
+                "metadata": metadata or {}
+            }
+        
+        # Store only what changed since the previous overall checkpoint
+        if previous and previous[2] < self.max_delta_chain:
+            parent_id, base, depth, _ = previous
+            stored = {
+                "delta_of": parent_id,
+                "changes": {k: v for k, v in snapshot.items() if base.get(k) != v}
+            }
+            depth += 1
+        else:
+            stored, depth = snapshot, 0
         
         # Save to file
-        snapshot_path = self.file_store.save_snapshot(snapshot, checkpoint_id)
+        snapshot_path = self.file_store.save_snapshot(stored, checkpoint_id)
         file_info = self.file_store.get_file_info(checkpoint_id)
         
-        # Store metadata in DB
-        self.db.execute("""
-            INSERT INTO checkpoints 
-            (checkpoint_id, session_id, task_id, level, snapshot_path, 
-             snapshot_size, snapshot_hash, timestamp, tags, metadata)
-            VALUES (?, ?, NULL, 'overall', ?, ?, ?, ?, ?, ?)
-        """, (checkpoint_id, session_id, snapshot_path, file_info['size'],
-              file_info['hash'], snapshot['timestamp'], json.dumps(tags or []),
-              json.dumps(metadata or {})))
-        
-        return checkpoint_id
+        row = {
+            "checkpoint_id": checkpoint_id,
+            "session_id": session_id,
+            "task_id": None,
+            "level": "overall",
+            "snapshot_path": snapshot_path,
+            "snapshot_size": file_info['size'],
+            "snapshot_hash": file_info['hash'],
+            "timestamp": snapshot['timestamp'],
+            "tags": _dumps(tags or []),
+            "metadata": _dumps(metadata or {}),
+        }
+        return row, (checkpoint_id, snapshot, depth, state)
     
     def create_subtask(self, task_id: str, tags: List[str] = None,
-                      metadata: Dict = None) -> str:
+                      metadata: Dict = None, checkpoint_id: str = None) -> str:
         """
         Create sub-task checkpoint.
         
@@ -75,11 +184,12 @@ class CheckpointManager:
             task_id: Task ID
             tags: Optional tags
             metadata: Optional metadata
+            checkpoint_id: Pre-allocated ID (generated if omitted)
             
         Returns:
             Checkpoint ID
         """
-        checkpoint_id = f"cp_{uuid.uuid4().hex[:8]}"
+        checkpoint_id = checkpoint_id or f"cp_{uuid.uuid4().hex[:8]}"
         
         # Get task info
         task = self.task_manager.get(task_id)
@@ -113,13 +223,14 @@ class CheckpointManager:
              snapshot_size, snapshot_hash, timestamp, tags, metadata)
             VALUES (?, ?, ?, 'subtask', ?, ?, ?, ?, ?, ?)
         """, (checkpoint_id, session_id, task_id, snapshot_path, file_info['size'],
-              file_info['hash'], snapshot['timestamp'], json.dumps(tags or []),
-              json.dumps(metadata or {})))
+              file_info['hash'], snapshot['timestamp'], _dumps(tags or []),
+              _dumps(metadata or {})))
+        self.version = next(self._versions)
         
         return checkpoint_id
     
     def create_stage(self, task_id: str, stage_name: str, tags: List[str] = None,
-                    metadata: Dict = None) -> str:
+                    metadata: Dict = None, checkpoint_id: str = None) -> str:
         """
         Create stage checkpoint within a task.
         
@@ -128,11 +239,12 @@ class CheckpointManager:
             stage_name: Stage name
             tags: Optional tags
             metadata: Optional metadata
+            checkpoint_id: Pre-allocated ID (generated if omitted)
             
         Returns:
             Checkpoint ID
         """
-        checkpoint_id = f"cp_{uuid.uuid4().hex[:8]}"
+        checkpoint_id = checkpoint_id or f"cp_{uuid.uuid4().hex[:8]}"
         
         task = self.task_manager.get(task_id)
         if not task:
@@ -166,8 +278,9 @@ class CheckpointManager:
              snapshot_size, snapshot_hash, timestamp, tags, metadata)
             VALUES (?, ?, ?, 'stage', ?, ?, ?, ?, ?, ?)
         """, (checkpoint_id, session_id, task_id, snapshot_path, file_info['size'],
-              file_info['hash'], snapshot['timestamp'], json.dumps(tags or []),
-              json.dumps(metadata or {})))
+              file_info['hash'], snapshot['timestamp'], _dumps(tags or []),
+              _dumps(metadata or {})))
+        self.version = next(self._versions)
         
         return checkpoint_id
     
@@ -190,13 +303,73 @@ class CheckpointManager:
             return None
         
         # Load snapshot from file
-        snapshot = self.file_store.load_snapshot(checkpoint_id)
+        snapshot = self._load_snapshot(checkpoint_id)
         
         return {
             **metadata,
             "snapshot": snapshot
         }
     
+    def _load_snapshot(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a snapshot, rebuilding delta checkpoints from their parent chain.
+        
+        Args:
+            checkpoint_id: Checkpoint ID
+            
+        Returns:
+            Full snapshot dictionary or None if missing
+        """
+        snapshot = self._load_stored(checkpoint_id)
+        chain = []
+        while snapshot is not None and "delta_of" in snapshot:
+            chain.append(snapshot["changes"])
+            snapshot = self._load_stored(snapshot["delta_of"])
+        
+        if snapshot is None:
+            return None
+        # Always a new top-level dict, never the cached one
+        snapshot = dict(snapshot)
+        for changes in reversed(chain):
+            snapshot.update(changes)
+        return snapshot
+    
+    def _load_stored(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        """Load a snapshot file as stored, through the parsed-snapshot LRU."""
+        with self._stored_lock:
+            stored = self._stored.get(checkpoint_id)
+            if stored is not None:
+                self._stored.move_to_end(checkpoint_id)
+                return stored
+        
+        stored = self.file_store.load_snapshot(checkpoint_id)
+        if stored is not None:
+            with self._stored_lock:
+                self._stored[checkpoint_id] = stored
+                if len(self._stored) > self.SNAPSHOT_CACHE_SIZE:
+                    self._stored.popitem(last=False)
+        return stored
+    
+    def _forget_stored(self, checkpoint_id: str):
+        """Drop a snapshot file from the LRU after it is rewritten or deleted."""
+        with self._stored_lock:
+            self._stored.pop(checkpoint_id, None)
+    
+    def _materialize(self, checkpoint_id: str):
+        """Rewrite a delta checkpoint as a full snapshot so its parents can be deleted."""
+        snapshot = self._load_snapshot(checkpoint_id)
+        if snapshot is None:
+            return
+        
+        self.file_store.save_snapshot(snapshot, checkpoint_id)
+        self._forget_stored(checkpoint_id)
+        file_info = self.file_store.get_file_info(checkpoint_id)
+        self.db.execute(
+            "UPDATE checkpoints SET snapshot_size = ?, snapshot_hash = ? WHERE checkpoint_id = ?",
+            (file_info['size'], file_info['hash'], checkpoint_id)
+        )
+        self.version = next(self._versions)
+    
     def list(self, session_id: str, task_id: str = None, level: str = None,
              tags: List[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
         """
@@ -212,6 +385,31 @@ class CheckpointManager:
         Returns:
             List of checkpoint metadata
         """
+        sql, params = self._list_query(session_id, task_id, level, tags, limit)
+        return self.db.fetch_all(sql, params)
+    
+    def iter_list_json(self, session_id: str, task_id: str = None, level: str = None,
+                       tags: List[str] = None, limit: int = 50) -> str:
+        """
+        List checkpoints already serialized as a response body.
+        
+        Encodes rows one at a time straight off the cursor instead of
+        building the full list of dicts first.
+        
+        Returns:
+            JSON string of the form {"checkpoints": [...], "count": n}
+        """
+        sql, params = self._list_query(session_id, task_id, level, tags, limit)
+        
+        parts = []
+        for row in self.db.iter_rows(sql, params):
+            parts.append(_dumps(dict(row)))
+        
+        return '{"checkpoints": [' + ", ".join(parts) + '], "count": ' + str(len(parts)) + "}"
+    
+    def _list_query(self, session_id: str, task_id: str = None, level: str = None,
+                    tags: List[str] = None, limit: int = 50) -> Tuple[str, List[Any]]:
+        """Build the filtered checkpoint list SELECT."""
         sql = "SELECT * FROM checkpoints WHERE session_id = ?"
         params = [session_id]
         
@@ -231,7 +429,7 @@ class CheckpointManager:
         sql += " ORDER BY timestamp DESC LIMIT ?"
         params.append(limit)
         
-        return self.db.fetch_all(sql, params)
+        return sql, params
     
     def restore(self, session_id: str, checkpoint_id: str, level: str = 'overall'):
         """
@@ -251,20 +449,61 @@ class CheckpointManager:
         
         snapshot = checkpoint['snapshot']
         
-        if level == 'overall':
-            # Restore tasks
-            if 'tasks' in snapshot and snapshot['tasks']:
-                self._restore_tasks(session_id, snapshot['tasks'])
+        # One transaction for the whole restore instead of a commit per row
+        with self.db.transaction():
+            if level == 'overall':
+                self._restore_overall(session_id, snapshot)
+            
+            elif level == 'subtask':
+                if 'task_details' in snapshot:
+                    self._restore_tasks(session_id, snapshot['task_details'])
             
-            # Restore memory - clear existing first to avoid duplicates
-            if 'long_term_memory' in snapshot:
+            elif level == 'stage':
+                # Restore specific state
+                if 'current_state' in snapshot:
+                    state = snapshot['current_state']
+                    if 'task' in state:
+                        task = state['task']
+                        self.task_manager.update_progress(
+                            task['task_id'],
+                            task['progress'],
+                            task['status']
+                        )
+        
+        return True
+    
+    def _restore_overall(self, session_id: str, snapshot: Dict[str, Any]):
+        """
+        Restore a session from an overall snapshot.
+        
+        Only what differs from the live state is written: task subtrees whose
+        Merkle hash still matches are skipped, and memory that is unchanged
+        since the checkpoint is left in place rather than deleted and re-added.
+        """
+        # Restore tasks
+        if 'tasks' in snapshot and snapshot['tasks']:
+            saved = snapshot.get('merkle') or self._merkle_hashes(snapshot['tasks'])
+            current = self._merkle_hashes(self.task_manager.get_tree(session_id))
+            unchanged = {
+                task_id for task_id, digest in saved['tasks'].items()
+                if current['tasks'].get(task_id) == digest
+            }
+            self._restore_tasks(session_id, snapshot['tasks'], unchanged)
+        
+        # Restore memory - clear existing first to avoid duplicates
+        if 'long_term_memory' in snapshot:
+            memories = snapshot['long_term_memory']
+            # One row past the snapshot's so extra newer rows count as a change
+            live = self.memory_manager.retrieve_long_term(session_id, limit=len(memories) + 1)
+            if sorted(map(self._memory_key, live)) != sorted(map(self._memory_key, memories)):
                 # Clear existing session memories
                 self.db.execute(
                     "DELETE FROM long_term_memory WHERE session_id = ?",
                     (session_id,)
                 )
+                self.memory_manager.touch()
                 # Add checkpoint memories
-                for memory in snapshot['long_term_memory']:
+                for memory in memories:
                     self.memory_manager.store_long_term(
                         session_id,
                         memory['memory_type'],
@@ -273,43 +512,38 @@ class CheckpointManager:
                         memory.get('confidence', 1.0),
                         memory.get('source', '')
                     )
-            
-            if 'short_term_memory' in snapshot:
-                stm = snapshot['short_term_memory']
-                if stm:
-                    # Clear and restore short-term memory
-                    self.db.execute(
-                        "DELETE FROM short_term_memory WHERE session_id = ?",
-                        (session_id,)
-                    )
-                    self.memory_manager.store_short_term(
-                        session_id,
-                        active_context=stm.get('active_context'),
-                        recent_actions=stm.get('recent_actions'),
-                        focus_area=stm.get('focus_area'),
-                        temporary_state=stm.get('temporary_state')
-                    )
-        
-        elif level == 'subtask':
-            if 'task_details' in snapshot:
-                self._restore_tasks(session_id, snapshot['task_details'])
-        
-        elif level == 'stage':
-            # Restore specific state
-            if 'current_state' in snapshot:
-                state = snapshot['current_state']
-                if 'task' in state:
-                    task = state['task']
-                    self.task_manager.update_progress(
-                        task['task_id'],
-                        task['progress'],
-                        task['status']
-                    )
         
-        return True
+        if 'short_term_memory' in snapshot:
+            stm = snapshot['short_term_memory']
+            if stm and self.memory_manager.get_short_term(session_id) != stm:
+                # Clear and restore short-term memory
+                self.db.execute(
+                    "DELETE FROM short_term_memory WHERE session_id = ?",
+                    (session_id,)
+                )
+                self.memory_manager.touch()
+                self.memory_manager.store_short_term(
+                    session_id,
+                    active_context=stm.get('active_context'),
+                    recent_actions=stm.get('recent_actions'),
+                    focus_area=stm.get('focus_area'),
+                    temporary_state=stm.get('temporary_state')
+                )
+    
+    @staticmethod
+    def _memory_key(memory: Dict[str, Any]) -> Tuple:
+        """What restore recreates of a long-term memory row; ids and times are new."""
+        return (memory['memory_type'], _dumps(memory['content']), _dumps(memory.get('tags') or []),
+                memory.get('confidence'), memory.get('source'))
     
-    def _restore_tasks(self, session_id: str, task_tree: Dict[str, Any]):
-        """Recursively restore tasks from tree."""
+    def _restore_tasks(self, session_id: str, task_tree: Dict[str, Any],
+                       unchanged: set = frozenset()):
+        """
+        Recursively restore tasks from tree.
+        
+        Args:
+            unchanged: IDs of tasks whose whole subtree already matches and is skipped
+        """
         # Handle the tree structure from get_tree()
         if 'main_tasks' in task_tree:
             tasks = task_tree['main_tasks']
@@ -323,7 +557,7 @@ class CheckpointManager:
             task_id = task.get('task_id')
             
             # Skip if no task_id (might be tree wrapper)
-            if not task_id:
+            if not task_id or task_id in unchanged:
                 continue
             
             # Check if task exists
@@ -358,7 +592,7 @@ class CheckpointManager:
             
             # Restore sub-tasks
             if 'subtasks' in task and task['subtasks']:
-                self._restore_tasks(session_id, task['subtasks'])
+                self._restore_tasks(session_id, task['subtasks'], unchanged)
     
     def diff(self, checkpoint_id_1: str, checkpoint_id_2: str) -> Dict[str, Any]:
         """
@@ -386,49 +620,116 @@ class CheckpointManager:
         
         # Compare task progress
         if 'snapshot' in cp1 and 'snapshot' in cp2:
-            tasks1 = self._extract_task_progress(cp1['snapshot'])
-            tasks2 = self._extract_task_progress(cp2['snapshot'])
-            
-            changes = []
-            for task_id in set(tasks1.keys()) | set(tasks2.keys()):
-                if task_id not in tasks1:
-                    changes.append(f"NEW: {task_id}")
-                elif task_id not in tasks2:
-                    changes.append(f"REMOVED: {task_id}")
-                elif tasks1[task_id] != tasks2[task_id]:
-                    changes.append(
-                        f"CHANGED: {task_id} {tasks1[task_id]} → {tasks2[task_id]}"
-                    )
-            
-            diff['changes']['tasks'] = changes
+            diff['changes']['tasks'] = self._diff_tasks(cp1['snapshot'], cp2['snapshot'])
         
         return diff
     
-    def _extract_task_progress(self, snapshot: Dict[str, Any]) -> Dict[str, float]:
-        """Extract task progress from snapshot."""
-        progress = {}
-        
-        def extract(tasks):
-            if not tasks:
-                return
-            
-            # Handle tree structure from get_tree()
-            if isinstance(tasks, dict):
-                if 'main_tasks' in tasks:
-                    tasks = tasks['main_tasks']
-                else:
-                    tasks = [tasks]
-            
-            for task in tasks:
-                if 'task_id' in task:
-                    progress[task['task_id']] = task['progress']
-                if 'subtasks' in task and task['subtasks']:
-                    extract(task['subtasks'])
+    @staticmethod
+    def _task_nodes(tasks) -> List[Dict[str, Any]]:
+        """Normalise a get_tree() result into a list of task nodes."""
+        if not tasks:
+            return []
+        if isinstance(tasks, dict):
+            return tasks['main_tasks'] if 'main_tasks' in tasks else [tasks]
+        return tasks
+    
+    def _merkle_hashes(self, tasks) -> Dict[str, Any]:
+        """
+        Compute a Merkle hash for every task subtree.
         
-        if 'tasks' in snapshot:
-            extract(snapshot['tasks'])
+        Each node hashes its own fields plus the hashes of its subtasks, so
+        equal hashes mean identical subtrees and diff() can skip them.
+        """
+        hashes = {}
+        
+        def visit(task):
+            h = hashlib.blake2b(digest_size=16)
+            own = {k: v for k, v in task.items() if k != 'subtasks'}
+            h.update(json.dumps(own, sort_keys=True, default=str).encode())
+            for subtask in task.get('subtasks') or []:
+                h.update(visit(subtask).encode())
+            digest = h.hexdigest()
+            if 'task_id' in task:
+                hashes[task['task_id']] = digest
+            return digest
+        
+        root = hashlib.blake2b(digest_size=16)
+        for task in self._task_nodes(tasks):
+            root.update(visit(task).encode())
+        
+        return {"root": root.hexdigest(), "tasks": hashes}
+    
+    def _diff_tasks(self, snapshot1: Dict[str, Any],
+                    snapshot2: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Diff task progress by Merkle descent, skipping unchanged subtrees.
         
-        return progress
+        Returns:
+            Change records: {"op": "changed", "task_id", "field", "old", "new"}
+            for a progress change, {"op": "new" | "removed", "task_id"} otherwise
+        """
+        tasks1 = snapshot1.get('tasks')
+        tasks2 = snapshot2.get('tasks')
+        
+        # Snapshots written before hashes were stored get them computed on load
+        hashes1 = snapshot1.get('merkle') or self._merkle_hashes(tasks1)
+        hashes2 = snapshot2.get('merkle') or self._merkle_hashes(tasks2)
+        if hashes1['root'] == hashes2['root']:
+            return []
+        
+        changes = []
+        added = {}
+        removed = {}
+        
+        def collect(task, into):
+            if 'task_id' in task:
+                into[task['task_id']] = task['progress']
+            for subtask in task.get('subtasks') or []:
+                collect(subtask, into)
+        
+        def descend(nodes1, nodes2):
+            by_id = {t['task_id']: t for t in nodes2 if 'task_id' in t}
+            seen = set()
+            for task1 in nodes1:
+                task_id = task1.get('task_id')
+                task2 = by_id.get(task_id)
+                if task2 is None:
+                    collect(task1, removed)
+                    continue
+                seen.add(task_id)
+                if hashes1['tasks'].get(task_id) == hashes2['tasks'].get(task_id):
+                    continue
+                if task1['progress'] != task2['progress']:
+                    changes.append({
+                        "op": "changed", "task_id": task_id, "field": "progress",
+                        "old": task1['progress'], "new": task2['progress']
+                    })
+                descend(task1.get('subtasks') or [], task2.get('subtasks') or [])
+            for task2 in nodes2:
+                if task2.get('task_id') not in seen:
+                    collect(task2, added)
+        
+        descend(self._task_nodes(tasks1), self._task_nodes(tasks2))
+        
+        # A task that moved between parents shows up on both sides
+        for task_id in added.keys() & removed.keys():
+            old, new = removed.pop(task_id), added.pop(task_id)
+            if old != new:
+                changes.append({
+                    "op": "changed", "task_id": task_id, "field": "progress",
+                    "old": old, "new": new
+                })
+        changes.extend({"op": "new", "task_id": task_id} for task_id in added)
+        changes.extend({"op": "removed", "task_id": task_id} for task_id in removed)
+        
+        return changes
+    
+    @staticmethod
+    def format_change(change: Dict[str, Any]) -> str:
+        """Render one diff() change record as a line of text."""
+        if change['op'] == 'changed':
+            return f"CHANGED: {change['task_id']} {change['old']} → {change['new']}"
+        return f"{change['op'].upper()}: {change['task_id']}"
     
     def cleanup_old(self, session_id: str, keep_last: int = 10) -> int:
         """
@@ -441,24 +742,37 @@ class CheckpointManager:
         Returns:
             Number of checkpoints deleted
         """
-        checkpoints = self.list(session_id, limit=1000)
-        
-        if len(checkpoints) <= keep_last:
-            return 0
-        
-        # Get checkpoints to delete
-        to_delete = checkpoints[keep_last:]
-        deleted = 0
-        
-        for cp in to_delete:
-            # Delete file
-            self.file_store.delete_snapshot(cp['checkpoint_id'])
+        kept = [row['checkpoint_id'] for row in self.db.fetch_all(
+            "SELECT checkpoint_id FROM checkpoints WHERE session_id = ? "
+            "ORDER BY timestamp DESC LIMIT ?",
+            (session_id, keep_last)
+        )]
+        
+        with self.db.transaction() as conn:
+            # Every older row goes in one statement
+            doomed = {row[0] for row in conn.execute(
+                "DELETE FROM checkpoints WHERE session_id = ? "
+                "AND checkpoint_id NOT IN (SELECT value FROM json_each(?)) "
+                "RETURNING checkpoint_id",
+                (session_id, _dumps(kept))
+            ).fetchall()}
+            if not doomed:
+                return 0
             
-            # Delete DB record
-            self.db.execute(
-                "DELETE FROM checkpoints WHERE checkpoint_id = ?",
-                (cp['checkpoint_id'],)
-            )
-            deleted += 1
-        
-        return deleted
+            # Kept deltas whose parent is going away become full snapshots
+            # while the parent files still exist, oldest first so later
+            # deltas in the chain keep a valid parent
+            for checkpoint_id in reversed(kept):
+                stored = self._load_stored(checkpoint_id)
+                if stored is not None and stored.get("delta_of") in doomed:
+                    self._materialize(checkpoint_id)
+        self.version = next(self._versions)
+        
+        # The next overall checkpoint starts a fresh chain
+        self._last_overall.pop(session_id, None)
+        
+        for checkpoint_id in doomed:
+            self.file_store.delete_snapshot(checkpoint_id)
+            self._forget_stored(checkpoint_id)
+        
+        return len(doomed)
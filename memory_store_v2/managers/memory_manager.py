@@ -1,11 +1,13 @@
 """
 Memory manager for long-term and short-term memory operations.
 """
+import itertools
 import time
 import hashlib
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from ..core.database import Database
+from ..core.json_codec import dumps as _dumps, loads as _loads
 
 
 class MemoryManager:
@@ -13,6 +15,15 @@ class MemoryManager:
     
     def __init__(self, db: Database):
         self.db = db
+        # Bumped on every write so callers can key caches on the memory store state
+        self.version = 0
+        # Writes come from the writer thread and the event loop; next() on a
+        # count cannot lose an increment the way += can
+        self._versions = itertools.count(1)
+    
+    def touch(self):
+        """Mark the memory store as changed, for writes made outside this manager."""
+        self.version = next(self._versions)
     
     # Long-term Memory
     def store_long_term(self, session_id: str, memory_type: str,
@@ -32,6 +43,7 @@ class MemoryManager:
         Returns:
             Memory ID
         """
+        # Stays on the stdlib encoder: content_hash must match rows already stored
         content_str = json.dumps(content, sort_keys=True)
         content_hash = hashlib.md5(content_str.encode()).hexdigest()
         
@@ -51,7 +63,8 @@ class MemoryManager:
             (session_id, memory_type, content_hash, content, tags, confidence, source, created_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (session_id, memory_type, content_hash, content_str,
-              json.dumps(tags or []), confidence, source, now))
+              _dumps(tags or []), confidence, source, now))
+        self.version = next(self._versions)
         
         return cursor.lastrowid
     
@@ -69,6 +82,49 @@ class MemoryManager:
         Returns:
             List of memory dictionaries
         """
+        sql, params = self._long_term_query(session_id, query, memory_type, limit)
+        results = self.db.fetch_all(sql, params)
+        
+        # Parse JSON content back to dict
+        for result in results:
+            result['content'] = _loads(result['content'])
+            result['tags'] = _loads(result['tags']) if result['tags'] else []
+        
+        return results
+    
+    def iter_long_term_json(self, session_id: str, query: str = None,
+                            memory_type: str = None, limit: int = 10) -> str:
+        """
+        Retrieve long-term memory already serialized as a response body.
+        
+        Produces the same JSON as dumping retrieve_long_term() results, but
+        splices the stored content/tags JSON text straight from the cursor
+        instead of parsing it into dicts and encoding it again.
+        
+        Returns:
+            JSON string of the form {"results": [...], "count": n}
+        """
+        sql, params = self._long_term_query(session_id, query, memory_type, limit)
+        
+        parts = []
+        for row in self.db.iter_rows(sql, params):
+            fields = []
+            for key in row.keys():
+                value = row[key]
+                if key == 'content':
+                    encoded = value
+                elif key == 'tags':
+                    encoded = value or '[]'
+                else:
+                    encoded = json.dumps(value)
+                fields.append(f'"{key}": {encoded}')
+            parts.append("{" + ", ".join(fields) + "}")
+        
+        return '{"results": [' + ", ".join(parts) + '], "count": ' + str(len(parts)) + "}"
+    
+    def _long_term_query(self, session_id: str, query: str = None,
+                         memory_type: str = None, limit: int = 10) -> Tuple[str, List[Any]]:
+        """Build the filtered long-term memory SELECT."""
         sql = "SELECT * FROM long_term_memory WHERE session_id = ?"
         params = [session_id]
         
@@ -83,14 +139,7 @@ class MemoryManager:
         sql += " ORDER BY created_at DESC LIMIT ?"
         params.append(limit)
         
-        results = self.db.fetch_all(sql, params)
-        
-        # Parse JSON content back to dict
-        for result in results:
-            result['content'] = json.loads(result['content'])
-            result['tags'] = json.loads(result['tags']) if result['tags'] else []
-        
-        return results
+        return sql, params
     
     def get_patterns(self, session_id: str, pattern_type: str) -> List[Dict[str, Any]]:
         """
@@ -141,10 +190,10 @@ class MemoryManager:
                     temporary_state = ?, updated_at = ?
                 WHERE session_id = ?
             """, (
-                json.dumps(active_context or {}),
-                json.dumps(recent_actions or []),
+                _dumps(active_context or {}),
+                _dumps(recent_actions or []),
                 focus_area,
-                json.dumps(temporary_state or {}),
+                _dumps(temporary_state or {}),
                 now,
                 session_id
             ))
@@ -155,12 +204,13 @@ class MemoryManager:
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (
                 session_id,
-                json.dumps(active_context or {}),
-                json.dumps(recent_actions or []),
+                _dumps(active_context or {}),
+                _dumps(recent_actions or []),
                 focus_area,
-                json.dumps(temporary_state or {}),
+                _dumps(temporary_state or {}),
                 now
             ))
+        self.version = next(self._versions)
     
     def get_short_term(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -178,9 +228,9 @@ class MemoryManager:
         )
         
         if result:
-            result['active_context'] = json.loads(result['active_context'] or "{}")
-            result['recent_actions'] = json.loads(result['recent_actions'] or "[]")
-            result['temporary_state'] = json.loads(result['temporary_state'] or "{}")
+            result['active_context'] = _loads(result['active_context'] or "{}")
+            result['recent_actions'] = _loads(result['recent_actions'] or "[]")
+            result['temporary_state'] = _loads(result['temporary_state'] or "{}")
         
         return result
     
@@ -188,59 +238,92 @@ class MemoryManager:
         """
         Add to working context.
         
+        The merge runs inside SQLite as a single upsert, so the stored row is
+        never read back and re-encoded here.
+        
         Args:
             session_id: Session ID
             context: Context to add
         """
-        short_term = self.get_short_term(session_id) or {}
-        contexts = short_term.get('active_context', {})
+        if any('"' in str(key) for key in context):
+            # JSON paths cannot quote these keys; merge in Python instead
+            short_term = self.get_short_term(session_id) or {}
+            contexts = short_term.get('active_context', {})
+            contexts.update(context)
+            self.store_short_term(
+                session_id,
+                active_context=contexts,
+                recent_actions=short_term.get('recent_actions'),
+                focus_area=short_term.get('focus_area'),
+                temporary_state=short_term.get('temporary_state')
+            )
+            return
         
-        # Merge new context
-        contexts.update(context)
+        # Top-level keys are replaced, as with dict.update
+        paths = []
+        for key, value in context.items():
+            paths += [f'$."{key}"', _dumps(value)]
+        sets = ", ?, json(?)" * len(context)
         
-        # Store with all existing data preserved
-        self.store_short_term(
-            session_id,
-            active_context=contexts,
-            recent_actions=short_term.get('recent_actions'),
-            focus_area=short_term.get('focus_area'),
-            temporary_state=short_term.get('temporary_state')
-        )
+        self.db.execute(f"""
+            INSERT INTO short_term_memory 
+            (session_id, active_context, recent_actions, focus_area, temporary_state, updated_at)
+            VALUES (?, json_set('{{}}'{sets}), '[]', NULL, '{{}}', ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                active_context = json_set(COALESCE(active_context, '{{}}'){sets}),
+                updated_at = excluded.updated_at
+        """, (session_id, *paths, time.time(), *paths))
+        self.version = next(self._versions)
     
     def push_action(self, session_id: str, action: Dict[str, Any]):
         """
         Add recent action.
         
+        Appends and trims to the last 10 actions inside SQLite as a single
+        upsert. json_remove keeps the stored text of the remaining actions
+        as-is, so numbers are not re-rounded.
+        
         Args:
             session_id: Session ID
             action: Action to add
         """
-        # Get current state
-        short_term = self.get_short_term(session_id)
-        
-        if short_term is None:
-            # No existing short-term memory, create with just the action
-            self.store_short_term(
-                session_id,
-                recent_actions=[action]
-            )
-        else:
-            # Get existing actions
-            actions = short_term.get('recent_actions', [])
-            
-            # Keep last 10 actions
-            actions.append(action)
-            actions = actions[-10:]
-            
-            # Store with other existing data
-            self.store_short_term(
-                session_id,
-                active_context=short_term.get('active_context'),
-                recent_actions=actions,
-                focus_area=short_term.get('focus_area'),
-                temporary_state=short_term.get('temporary_state')
-            )
+        self.db.execute("""
+            INSERT INTO short_term_memory 
+            (session_id, active_context, recent_actions, focus_area, temporary_state, updated_at)
+            VALUES (?1, '{}', json_array(json(?2)), NULL, '{}', ?3)
+            ON CONFLICT(session_id) DO UPDATE SET
+                recent_actions = (
+                    WITH RECURSIVE kept(actions) AS (
+                        SELECT json_insert(COALESCE(short_term_memory.recent_actions, '[]'), '$[#]', json(?2))
+                        UNION ALL
+                        SELECT json_remove(actions, '$[0]') FROM kept
+                        WHERE json_array_length(actions) > 10
+                    )
+                    SELECT actions FROM kept WHERE json_array_length(actions) <= 10
+                ),
+                updated_at = excluded.updated_at
+        """, (session_id, _dumps(action), time.time()))
+        self.version = next(self._versions)
     
+    def push_many(self, pushes: List[Tuple[str, str, Dict[str, Any]]]):
+        """
+        Apply a batch of context/action pushes in one transaction.
+        
+        Each push runs the same upsert as push_context / push_action, so the
+        batch either lands in full or not at all.
+
+        Args:
+            pushes: (kind, session_id, payload) tuples in arrival order, where
+                kind is "context" (merged like push_context) or "action"
+                (appended like push_action)
+        """
+        with self.db.transaction():
+            for kind, session_id, payload in pushes:
+                if kind == "context":
+                    self.push_context(session_id, payload)
+                else:
+                    self.push_action(session_id, payload)
+
     def clear_short_term(self, session_id: str):
         """
         Clear working memory.
@@ -252,3 +335,4 @@ class MemoryManager:
             "DELETE FROM short_term_memory WHERE session_id = ?",
             (session_id,)
         )
+        self.version = next(self._versions)
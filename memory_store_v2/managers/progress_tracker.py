@@ -2,12 +2,15 @@
 Progress tracker - Real-time progress monitoring and history tracking.
 """
 import json
+import logging
 import time
 import asyncio
 from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime
 from enum import Enum
 
+logger = logging.getLogger(__name__)
+
 
 class ProgressStatus(Enum):
     PENDING = "pending"
@@ -67,9 +70,6 @@ class ProgressTracker:
         
         # Emit callback
         await self._emit_callback(task_id, progress, status)
-        
-        # Update parent progress
-        self.task_manager._update_parent_progress(task_id)
     
     async def _record_history(self, task_id: str, progress: float, 
                                status: str, metadata: Dict = None):
@@ -96,7 +96,7 @@ class ProgressTracker:
                 else:
                     callback(task_id, progress, status)
             except Exception as e:
-                print(f"Progress callback error: {e}")
+                logger.error(f"Progress callback error: {e}")
     
     def on_progress(self, task_id: str, callback: Callable):
         """Register progress callback for a task."""
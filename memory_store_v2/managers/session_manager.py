@@ -1,11 +1,12 @@
 """
 Session manager for creating and managing thinking sessions.
 """
+import itertools
 import time
 import uuid
-import json
 from typing import Optional, List, Dict, Any
 from ..core.database import Database
+from ..core.json_codec import dumps as _dumps, loads as _loads
 
 
 class SessionManager:
@@ -13,6 +14,11 @@ class SessionManager:
     
     def __init__(self, db: Database):
         self.db = db
+        # Bumped on every write so callers can cache reads against it
+        self.version = 0
+        # Writes come from the writer thread and the event loop; next() on a
+        # count cannot lose an increment the way += can
+        self._versions = itertools.count(1)
     
     def create(self, name: str, metadata: Dict[str, Any] = None, mode: str = "plan") -> str:
         """
@@ -33,52 +39,49 @@ class SessionManager:
             INSERT INTO sessions 
             (session_id, name, status, mode, created_at, updated_at, metadata)
             VALUES (?, ?, 'active', ?, ?, ?, ?)
-        """, (session_id, name, mode, now, now, json.dumps(metadata or {})))
+        """, (session_id, name, mode, now, now, _dumps(metadata or {})))
+        self.version = next(self._versions)
         
         return session_id
     
     def get(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get session by ID."""
-        return self.db.fetch_one(
+        """Get session by ID, with metadata decoded."""
+        session = self.db.fetch_one(
             "SELECT * FROM sessions WHERE session_id = ?",
             (session_id,)
         )
+        if session:
+            session['metadata'] = _loads(session['metadata'] or "{}")
+        return session
     
     def list(self, status: str = None) -> List[Dict[str, Any]]:
-        """List sessions with optional status filter."""
+        """List sessions with optional status filter, with metadata decoded."""
         if status:
-            return self.db.fetch_all(
+            sessions = self.db.fetch_all(
                 "SELECT * FROM sessions WHERE status = ? ORDER BY created_at DESC",
                 (status,)
             )
-        return self.db.fetch_all("SELECT * FROM sessions ORDER BY created_at DESC")
+        else:
+            sessions = self.db.fetch_all("SELECT * FROM sessions ORDER BY created_at DESC")
+        
+        for session in sessions:
+            session['metadata'] = _loads(session['metadata'] or "{}")
+        return sessions
     
     def update(self, session_id: str, status: str = None, metadata: Dict = None, mode: str = None):
         """Update session."""
-        updates = []
-        params = []
-        
-        if status:
-            updates.append("status = ?")
-            params.append(status)
-        
-        if metadata:
-            updates.append("metadata = ?")
-            params.append(json.dumps(metadata))
+        if not (status or metadata or mode):
+            return
         
-        if mode:
-            updates.append("mode = ?")
-            params.append(mode)
-        
-        if updates:
-            updates.append("updated_at = ?")
-            params.append(time.time())
-            params.append(session_id)
-            
-            self.db.execute(
-                f"UPDATE sessions SET {', '.join(updates)} WHERE session_id = ?",
-                params
-            )
+        # Fixed statement text, so the connection's statement cache always hits
+        self.db.execute("""
+            UPDATE sessions
+            SET status = COALESCE(?, status), metadata = COALESCE(?, metadata),
+                mode = COALESCE(?, mode), updated_at = ?
+            WHERE session_id = ?
+        """, (status or None, _dumps(metadata) if metadata else None, mode or None,
+              time.time(), session_id))
+        self.version = next(self._versions)
     
     def set_mode(self, session_id: str, mode: str):
         """Set session mode (plan or act)."""
@@ -102,6 +105,7 @@ class SessionManager:
                 conn.execute("DELETE FROM tasks WHERE session_id = ?", (session_id,))
                 conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
                 conn.commit()
+            self.version = next(self._versions)
             return True
         except Exception:
             return False
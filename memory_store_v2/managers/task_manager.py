@@ -2,11 +2,13 @@
 Task manager for hierarchical task management.
 Supports main tasks and sub-tasks with automatic progress aggregation.
 """
+import itertools
 import time
 import uuid
-import json
-from typing import Optional, List, Dict, Any
+import sqlite3
+from typing import Optional, List, Dict, Any, Iterable, Iterator
 from ..core.database import Database
+from ..core.json_codec import dumps as _dumps, loads as _loads
 
 
 class TaskManager:
@@ -14,6 +16,15 @@ class TaskManager:
     
     def __init__(self, db: Database):
         self.db = db
+        # Bumped on every write so callers can key caches on the task store state
+        self.version = 0
+        # Writes come from the writer thread and the event loop; next() on a
+        # count cannot lose an increment the way += can
+        self._versions = itertools.count(1)
+    
+    def touch(self):
+        """Mark the task store as changed, for writes made outside this manager."""
+        self.version = next(self._versions)
     
     def create_main_task(self, session_id: str, name: str, description: str = "",
                         priority: int = 0, tags: List[str] = None) -> str:
@@ -29,7 +40,8 @@ class TaskManager:
              priority, dependencies, tags, metadata, created_at, updated_at)
             VALUES (?, ?, NULL, ?, ?, 'pending', 0.0, ?, ?, ?, ?, ?, ?)
         """, (task_id, session_id, name, description, priority,
-              json.dumps([]), json.dumps(tags or []), json.dumps({}), now, now))
+              _dumps([]), _dumps(tags or []), _dumps({}), now, now))
+        self.version = next(self._versions)
         
         return task_id
     
@@ -47,70 +59,87 @@ class TaskManager:
              priority, dependencies, tags, metadata, created_at, updated_at)
             VALUES (?, ?, ?, ?, ?, 'pending', 0.0, ?, ?, ?, ?, ?, ?)
         """, (task_id, session_id, parent_id, name, description, priority,
-              json.dumps([]), json.dumps([]), json.dumps({}), now, now))
+              _dumps([]), _dumps([]), _dumps({}), now, now))
+        self.version = next(self._versions)
         
         return task_id
     
-    def update_progress(self, task_id: str, progress: float, status: str = None,
-                       metadata: Dict = None):
-        """Update task progress and status."""
-        updates = ["progress = ?", "updated_at = ?"]
-        params = [progress, time.time()]
-        
-        if status:
-            updates.append("status = ?")
-            params.append(status)
-        
-        if metadata:
-            updates.append("metadata = ?")
-            params.append(json.dumps(metadata))
+    def create_subtasks(self, session_id: str, parent_id: str,
+                        subtasks: List[Dict[str, Any]]) -> List[str]:
+        """
+        Create several sub-tasks under one parent with a single batched insert.
         
-        params.append(task_id)
+        Args:
+            session_id: Session ID
+            parent_id: Parent task ID
+            subtasks: Dicts with 'name' and optional 'description' and 'priority'
+            
+        Returns:
+            Sub-task IDs in input order
+        """
+        rows = []
+        for subtask in subtasks:
+            now = time.time()
+            rows.append({
+                "task_id": f"subtask_{uuid.uuid4().hex[:8]}",
+                "session_id": session_id,
+                "parent_id": parent_id,
+                "name": subtask['name'],
+                "description": subtask.get('description', ''),
+                "status": "pending",
+                "progress": 0.0,
+                "priority": subtask.get('priority', 0),
+                "dependencies": "[]",
+                "tags": "[]",
+                "metadata": "{}",
+                "created_at": now,
+                "updated_at": now
+            })
         
-        self.db.execute(
-            f"UPDATE tasks SET {', '.join(updates)} WHERE task_id = ?",
-            params
-        )
+        self.db.bulk_insert("tasks", rows)
+        if rows:
+            self.version = next(self._versions)
         
-        # Auto-update parent
-        self._update_parent_progress(task_id)
+        return [row["task_id"] for row in rows]
     
-    def _update_parent_progress(self, task_id: str):
-        """Recalculate parent progress from sub-tasks."""
-        result = self.db.fetch_one(
-            "SELECT parent_id FROM tasks WHERE task_id = ?", (task_id,)
-        )
-        
-        if not result or not result['parent_id']:
-            return
-        
-        parent_id = result['parent_id']
-        
-        stats = self.db.fetch_one("""
-            SELECT 
-                AVG(progress) as avg_progress,
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed
-            FROM tasks WHERE parent_id = ?
-        """, (parent_id,))
-        
-        if stats:
-            avg_progress = stats['avg_progress'] or 0.0
-            total = stats['total']
-            completed = stats['completed']
-            
-            new_status = "completed" if completed == total else "in_progress"
-            
-            self.db.execute("""
-                UPDATE tasks 
-                SET progress = ?, status = ?, updated_at = ?
-                WHERE task_id = ?
-            """, (avg_progress, new_status, time.time(), parent_id))
+    def update_progress(self, task_id: str, progress: float, status: str = None,
+                       metadata: Dict = None):
+        """Update task progress and status."""
+        # Fixed statement text, so the connection's statement cache always hits
+        self.db.execute("""
+            UPDATE tasks
+            SET progress = ?, updated_at = ?, status = COALESCE(?, status),
+                metadata = COALESCE(?, metadata)
+            WHERE task_id = ?
+        """, (progress, time.time(), status or None,
+              _dumps(metadata) if metadata else None, task_id))
+        # The parent's progress and status are rolled up by the
+        # trg_tasks_rollup trigger in the same statement
+        self.version = next(self._versions)
     
     def get(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get task by ID."""
         return self.db.fetch_one("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
     
+    def get_many(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get several tasks with one query.
+        
+        Args:
+            task_ids: Task IDs to fetch
+            
+        Returns:
+            Dict of task_id -> task row; missing IDs are left out
+        """
+        if not task_ids:
+            return {}
+        # IDs go in as one JSON array so the statement text is the same for any count
+        rows = self.db.fetch_all(
+            "SELECT * FROM tasks WHERE task_id IN (SELECT value FROM json_each(?))",
+            (_dumps(list(task_ids)),)
+        )
+        return {row['task_id']: row for row in rows}
+    
     def get_subtasks(self, parent_id: str) -> List[Dict[str, Any]]:
         """Get all sub-tasks of a task."""
         return self.db.fetch_all(
@@ -119,46 +148,104 @@ class TaskManager:
         )
     
     def get_tree(self, session_id: str, root_task_id: str = None) -> Dict[str, Any]:
-        """Get hierarchical task tree."""
+        """
+        Get hierarchical task tree.
+        
+        The whole tree comes back from one recursive query and is assembled
+        in memory, instead of one subtask query per node.
+        """
+        rows = self._fetch_tree_rows(session_id, root_task_id)
+        nodes, roots = self._assemble_tree(rows)
+        
         if root_task_id:
-            root = self.get(root_task_id)
-            if not root:
-                return None
-            return self._build_tree(root)
+            return nodes[roots[0]] if roots else None
+        return {
+            "session_id": session_id,
+            "main_tasks": [nodes[task_id] for task_id in roots]
+        }
+    
+    def get_layers(self, session_id: str, root_task_id: str = None) -> Dict[str, Any]:
+        """
+        Get the task tree grouped into depth layers.
+        
+        Args:
+            session_id: Session ID
+            root_task_id: Optional root task; whole session when omitted
+            
+        Returns:
+            {"layers": [[task_id, ...], ...], "nodes": {task_id: node}} where
+            layer n holds the tasks n levels below the roots and nodes omit
+            their nested subtasks
+        """
+        layers: List[List[str]] = []
+        nodes = {}
+        for row in self._fetch_tree_rows(session_id, root_task_id):
+            depth = row['depth']
+            if depth == len(layers):
+                layers.append([])
+            layers[depth].append(row['task_id'])
+            nodes[row['task_id']] = self._node(row)
+        return {"layers": layers, "nodes": nodes}
+    
+    def _fetch_tree_rows(self, session_id: str, root_task_id: str = None) -> Iterator[sqlite3.Row]:
+        """
+        Fetch every task under the roots with its depth, parents before children.
+        
+        Rows come straight off the cursor; _node() builds the only dict per task.
+        """
+        if root_task_id:
+            seed, params = "SELECT task_id, 0 FROM tasks WHERE task_id = ?", (root_task_id,)
         else:
-            main_tasks = self.db.fetch_all(
-                "SELECT * FROM tasks WHERE session_id = ? AND parent_id IS NULL ORDER BY created_at",
+            seed, params = (
+                "SELECT task_id, 0 FROM tasks WHERE session_id = ? AND parent_id IS NULL",
                 (session_id,)
             )
-            return {
-                "session_id": session_id,
-                "main_tasks": [self._build_tree(task) for task in main_tasks]
-            }
-    
-    def _build_tree(self, task: Dict[str, Any]) -> Dict[str, Any]:
-        """Recursively build task tree."""
-        task_id = task['task_id']
-        subtasks = self.get_subtasks(task_id)
         
-        dependencies = task.get('dependencies')
-        if dependencies is None:
-            dependencies = '[]'
+        return self.db.iter_rows(f"""
+            WITH RECURSIVE tree(task_id, depth) AS (
+                {seed}
+                UNION ALL
+                SELECT c.task_id, tree.depth + 1
+                FROM tasks c JOIN tree ON c.parent_id = tree.task_id
+            )
+            SELECT tasks.*, tree.depth AS depth
+            FROM tasks JOIN tree ON tasks.task_id = tree.task_id
+            ORDER BY tree.depth, tasks.created_at, tasks.rowid
+        """, params)
+    
+    def _assemble_tree(self, rows: Iterable[sqlite3.Row]):
+        """Link depth-ordered rows into nested nodes; returns (nodes, root ids)."""
+        nodes = {}
+        roots = []
+        for row in rows:
+            node = self._node(row)
+            node["subtasks"] = []
+            nodes[row['task_id']] = node
+            parent = nodes.get(row['parent_id']) if row['depth'] else None
+            if parent is None:
+                roots.append(row['task_id'])
+            else:
+                parent["subtasks"].append(node)
+        return nodes, roots
+    
+    def _node(self, task: sqlite3.Row) -> Dict[str, Any]:
+        """Tree node for one task row, with its JSON columns parsed."""
+        dependencies = task['dependencies']
         
         return {
-            "task_id": task_id,
+            "task_id": task['task_id'],
             "session_id": task['session_id'],
             "name": task['name'],
             "description": task['description'],
             "status": task['status'],
             "progress": task['progress'],
             "priority": task['priority'],
-            "dependencies": json.loads(dependencies) if dependencies else [],
-            "tags": json.loads(task['tags']) if task['tags'] else [],
-            "is_planned": task.get('is_planned', 0),
-            "is_executed": task.get('is_executed', 0),
-            "plan_session_id": task.get('plan_session_id'),
-            "act_session_id": task.get('act_session_id'),
-            "subtasks": [self._build_tree(st) for st in subtasks]
+            "dependencies": _loads(dependencies) if dependencies else [],
+            "tags": _loads(task['tags']) if task['tags'] else [],
+            "is_planned": task['is_planned'],
+            "is_executed": task['is_executed'],
+            "plan_session_id": task['plan_session_id'],
+            "act_session_id": task['act_session_id']
         }
     
     def add_dependency(self, task_id: str, depends_on: str) -> bool:
@@ -168,15 +255,16 @@ class TaskManager:
             return False
         
         deps_str = task.get('dependencies')
-        deps = json.loads(deps_str) if deps_str else []
+        deps = _loads(deps_str) if deps_str else []
         
         if depends_on not in deps:
             deps.append(depends_on)
         
         self.db.execute(
             "UPDATE tasks SET dependencies = ? WHERE task_id = ?",
-            (json.dumps(deps), task_id)
+            (_dumps(deps), task_id)
         )
+        self.version = next(self._versions)
         return True
     
     def list_by_status(self, session_id: str, status: str) -> List[Dict[str, Any]]:
@@ -198,6 +286,7 @@ class TaskManager:
         
         # Also mark all subtasks
         self._mark_subtasks_as_planned(task_id, plan_session_id)
+        self.version = next(self._versions)
     
     def _mark_subtasks_as_planned(self, parent_id: str, plan_session_id: str):
         """Mark all subtasks as planned."""
@@ -220,6 +309,7 @@ class TaskManager:
         
         # Also mark all subtasks
         self._mark_subtasks_as_executed(task_id, act_session_id)
+        self.version = next(self._versions)
     
     def _mark_subtasks_as_executed(self, parent_id: str, act_session_id: str):
         """Mark all subtasks as executed."""
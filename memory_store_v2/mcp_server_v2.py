@@ -3,36 +3,168 @@ MCP Server v2 - Production-ready with all tools implemented.
 Fixed: Missing tool handlers, input validation, connection cleanup
 """
 import asyncio
+import copy
+import functools
 import json
 import logging
 import os
-from typing import Dict, Any, List, Optional
+import sys
+import threading
+import time
+import uuid
+from io import TextIOWrapper
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from graphlib import TopologicalSorter, CycleError
 
+import anyio
+import jsonschema
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import TextContent, Tool
+from mcp.types import CallToolResult, TextContent, Tool
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
 
 from memory_store_v2 import MemorySystemV2
+from memory_store_v2.core.json_codec import loads as _loads
 from memory_store_v2.agents.orchestration_engine import OrchestrationEngine
+from memory_store_v2.agents.task_decomposition_agent import TaskDecompositionAgent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("chainofthought-coder-v2")
 
+# One shared compact encoder for every response payload
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+if HAS_ORJSON:
+    def _dumps(payload: Any) -> str:
+        """
+        Encode a response payload with orjson.
+
+        The decode stays: TextContent.text is a validated str, and the stdio
+        transport re-serializes the whole JSON-RPC message via pydantic, so
+        pre-encoded bytes could not be written through unchanged anyway.
+        """
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # orjson rejects valid values such as ints beyond 64 bits
+            return _ENCODER(payload)
+else:
+    _dumps = _ENCODER
+
+# Largest accepted tool-call arguments, measured as compact encoded JSON
+_MAX_ARG_BYTES = 2 << 20
+
+
+def _encoded_size(payload: Any) -> int:
+    """Size in bytes of a payload encoded as compact JSON."""
+    if HAS_ORJSON:
+        try:
+            return len(orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS))
+        except TypeError:
+            # Valid JSON orjson cannot encode, such as ints beyond 64 bits
+            pass
+    return len(_ENCODER(payload).encode("utf-8"))
+
+# Pre-serialized error envelopes - only the dynamic fields go through the encoder
+_ERR_UNKNOWN = '{"error":%s}'
+_ERR_VALIDATION = '{"error":%s,"type":"validation"}'
+_ERR_INTERNAL = '{"error":%s,"type":"internal","tool":%s,"action":%s}'
+
+# Pre-encoded constant responses, returned as-is
+_OK = [TextContent(type="text", text='{"success":true}')]
+_FAIL = [TextContent(type="text", text='{"success":false}')]
+_PLANNED = [TextContent(type="text", text='{"success":true,"planned":true}')]
+_EXECUTED = [TextContent(type="text", text='{"success":true,"executed":true}')]
+_PAUSED = [TextContent(type="text", text='{"success":true,"status":"paused"}')]
+_RESUMED = [TextContent(type="text", text='{"success":true,"status":"resumed"}')]
+_CANCELLED = [TextContent(type="text", text='{"success":true,"status":"cancelled"}')]
+_STORED_SHORT = [TextContent(type="text", text='{"success":true,"stored":"short_term"}')]
+_SESSION_NOT_FOUND = [TextContent(type="text", text='{"error":"Session not found"}')]
+_TASK_NOT_FOUND = [TextContent(type="text", text='{"error":"Task not found"}')]
+_CHECKPOINT_NOT_FOUND = [TextContent(type="text", text='{"error":"Checkpoint not found"}')]
+
+def _env_max_parallel() -> int:
+    """Parallel task limit from COT_MAX_PAR, defaulting to one slot per CPU."""
+    value = os.environ.get("COT_MAX_PAR")
+    if value:
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if limit >= 1:
+            return limit
+        logger.warning(f"Ignoring invalid COT_MAX_PAR={value!r}, using the CPU count")
+    return os.cpu_count() or 4
+
+_MAX_PARALLEL = _env_max_parallel()
+
 # Global instance with proper initialization
 memory: Optional[MemorySystemV2] = None
 orchestration: Optional[OrchestrationEngine] = None
 
+# Warm (memory, orchestration) pairs by storage path, so re-initializing against
+# the same store skips reopening the database and file store
+_SYSTEM_CACHE: Dict[str, Tuple[MemorySystemV2, OrchestrationEngine]] = {}
+_SYSTEM_CACHE_LOCK = threading.Lock()
+_SYSTEM_CACHE_STATS = {"hits": 0, "misses": 0, "init_time_ms": 0.0}
+
+def _storage_key() -> str:
+    """Cache key for the configured storage directory."""
+    return os.path.abspath(os.environ.get("MEMORY_STORE_DIR", "./memory_store_v2"))
+
 def init_memory_system():
     """Initialize memory system with proper error handling."""
     global memory, orchestration
     base_dir = os.environ.get("MEMORY_STORE_DIR", "./memory_store_v2")
-    memory = MemorySystemV2(base_dir)
-    orchestration = OrchestrationEngine(memory.tasks, max_parallel=4)
+    key = _storage_key()
+    
+    with _SYSTEM_CACHE_LOCK:
+        cached = _SYSTEM_CACHE.get(key)
+        if cached is not None:
+            _SYSTEM_CACHE_STATS["hits"] += 1
+            memory, orchestration = cached
+            return memory, orchestration
+        
+        start = time.perf_counter()
+        memory = MemorySystemV2(base_dir)
+        orchestration = OrchestrationEngine(memory.tasks, max_parallel=_MAX_PARALLEL)
+        _SYSTEM_CACHE[key] = (memory, orchestration)
+        _SYSTEM_CACHE_STATS["misses"] += 1
+        _SYSTEM_CACHE_STATS["init_time_ms"] += (time.perf_counter() - start) * 1000
+    
+    # Store versions restart at zero - drop responses cached against the old store
+    for cached_fn in (_cached_session, _cached_task, _cached_graph, _cached_cycles):
+        cached_fn.cache_clear()
+    _DIFFS.clear()
+    _READ_CACHE.clear()
     logger.info(f"Memory system initialized at: {base_dir}")
     return memory, orchestration
 
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counts and average cold start time of the memory system cache."""
+    misses = _SYSTEM_CACHE_STATS["misses"]
+    return {
+        "hits": _SYSTEM_CACHE_STATS["hits"],
+        "misses": misses,
+        "avg_init_time_ms": round(_SYSTEM_CACHE_STATS["init_time_ms"] / misses, 3) if misses else 0.0,
+        "cached_stores": len(_SYSTEM_CACHE)
+    }
+
 def get_memory() -> MemorySystemV2:
     """Get memory instance with lazy initialization."""
     global memory
@@ -40,6 +172,23 @@ def get_memory() -> MemorySystemV2:
         init_memory_system()
     return memory
 
+async def _read(fn, *args):
+    """Run a read-only memory call on a pooled reader thread, off the event loop."""
+    db = get_memory().db
+    if not db.read_pool_size:
+        return fn(*args)
+    return await asyncio.to_thread(db.run_read, fn, *args)
+
+# Handler writes run on one dedicated thread: the event loop stays free during
+# SQLite I/O and those writes keep their arrival order. The async agents behind
+# task_decomposer, design_planner, workflow_manager and parallel_executor still
+# write from the event loop on its own connection, ordered by SQLite's locking.
+_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cot-writer")
+
+async def _offload(fn, *args):
+    """Run a blocking memory call on the writer thread."""
+    return await asyncio.get_running_loop().run_in_executor(_WRITER, functools.partial(fn, *args))
+
 def get_orchestration() -> OrchestrationEngine:
     """Get orchestration instance with lazy initialization."""
     global orchestration
@@ -49,315 +198,420 @@ def get_orchestration() -> OrchestrationEngine:
 
 app = Server("chainofthought-coder-v2")
 
-@app.list_tools()
-async def list_tools():
-    """List all available tools with proper schemas."""
-    return [
-        # Session Management
-        Tool(
-            name="session_manager",
-            description="Manage thinking sessions - create, list, get, close, archive",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["create", "list", "get", "close", "archive", "set_mode", "get_mode", "update"],
-                        "description": "Action to perform"
-                    },
-                    "name": {"type": "string", "description": "Session name (for create)"},
-                    "session_id": {"type": "string", "description": "Session ID (for get/update/close)"},
-                    "status": {"type": "string", "enum": ["active", "paused", "completed", "archived"]},
-                    "mode": {"type": "string", "enum": ["plan", "act"], "description": "Plan or Act mode"},
-                    "metadata": {"type": "object", "description": "Additional session metadata"}
+@functools.lru_cache(maxsize=1024)
+def _cached_session(session_id: str, version: int) -> Optional[Dict[str, Any]]:
+    """Session row, memoized until the session store changes."""
+    return get_memory().sessions.get(session_id)
+
+@functools.lru_cache(maxsize=1024)
+def _cached_task(task_id: str, version: int) -> Optional[Dict[str, Any]]:
+    """Task row, memoized until the task store changes."""
+    return get_memory().tasks.get(task_id)
+
+def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """Get a session row through the read cache; returns a copy callers may modify."""
+    session = _cached_session(session_id, get_memory().sessions.version)
+    if not session:
+        return None
+    # metadata comes back decoded, so the nested dict must not be shared either
+    return {**session, "metadata": copy.deepcopy(session["metadata"])}
+
+def get_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """Get a task row through the read cache; returns a copy callers may modify."""
+    task = _cached_task(task_id, get_memory().tasks.version)
+    return dict(task) if task else None
+
+# Encoded responses of read-only actions, keyed by their arguments plus the version
+# of every store they read. Any write bumps a version, so stale entries just age out.
+_READ_CACHE: "OrderedDict[Tuple[Any, ...], List[TextContent]]" = OrderedDict()
+_MAX_READ_CACHE = 256
+
+async def _cached_read(key: Tuple[Any, ...], produce: Callable[[], Awaitable[List[TextContent]]]) -> List[TextContent]:
+    """Return the cached response for key, producing and storing it on a miss."""
+    response = _READ_CACHE.get(key)
+    if response is not None:
+        _READ_CACHE.move_to_end(key)
+        return response
+    
+    response = await produce()
+    _READ_CACHE[key] = response
+    if len(_READ_CACHE) > _MAX_READ_CACHE:
+        _READ_CACHE.popitem(last=False)
+    return response
+
+# Tool definitions are static - build them once at import
+_TOOLS_LIST = [
+    # Session Management
+    Tool(
+        name="session_manager",
+        description="Manage thinking sessions - create, list, get, close, archive",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["create", "list", "get", "close", "archive", "set_mode", "get_mode", "update"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "create": ["name"],
-                    "get": ["session_id"],
-                    "close": ["session_id"],
-                    "archive": ["session_id"],
-                    "set_mode": ["session_id", "mode"],
-                    "get_mode": ["session_id"],
-                    "update": ["session_id", "status"]
-                }
+                "name": {"type": "string", "description": "Session name (for create)"},
+                "session_id": {"type": "string", "description": "Session ID (for get/update/close)"},
+                "status": {"type": "string", "enum": ["active", "paused", "completed", "archived"]},
+                "mode": {"type": "string", "enum": ["plan", "act"], "description": "Plan or Act mode"},
+                "metadata": {"type": "object", "description": "Additional session metadata"}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "create": ["name"],
+                "get": ["session_id"],
+                "close": ["session_id"],
+                "archive": ["session_id"],
+                "set_mode": ["session_id", "mode"],
+                "get_mode": ["session_id"],
+                "update": ["session_id", "status"]
             }
-        ),
-        # Task Management
-        Tool(
-            name="task_manager",
-            description="Manage tasks with hierarchical structure and Plan/Act tracking",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["create_main", "create_subtask", "update", "get_tree", "add_dependency", 
-                                  "mark_planned", "mark_executed", "get_plan_summary", "get", "list"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "task_id": {"type": "string", "description": "Task ID"},
-                    "parent_id": {"type": "string", "description": "Parent task ID (for subtask)"},
-                    "name": {"type": "string", "description": "Task name"},
-                    "description": {"type": "string", "description": "Task description"},
-                    "progress": {"type": "number", "minimum": 0, "maximum": 1, "description": "Progress 0-1"},
-                    "status": {"type": "string", "enum": ["pending", "in_progress", "completed", "failed", "blocked"]},
-                    "priority": {"type": "integer", "minimum": 0, "description": "Task priority"},
-                    "depends_on": {"type": "string", "description": "Task ID this task depends on"},
-                    "plan_session_id": {"type": "string"},
-                    "act_session_id": {"type": "string"},
-                    "tags": {"type": "array", "items": {"type": "string"}}
+        }
+    ),
+    # Task Management
+    Tool(
+        name="task_manager",
+        description="Manage tasks with hierarchical structure and Plan/Act tracking",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["create_main", "create_subtask", "update", "get_tree", "add_dependency", 
+                              "mark_planned", "mark_executed", "get_plan_summary", "get", "list"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "create_main": ["session_id", "name"],
-                    "create_subtask": ["session_id", "parent_id", "name"],
-                    "update": ["task_id", "progress"],
-                    "get_tree": ["session_id"],
-                    "get": ["task_id"],
-                    "list": ["session_id"],
-                    "add_dependency": ["task_id", "depends_on"],
-                    "mark_planned": ["task_id"],
-                    "mark_executed": ["task_id"],
-                    "get_plan_summary": ["session_id"]
-                }
+                "session_id": {"type": "string", "description": "Session ID"},
+                "task_id": {"type": "string", "description": "Task ID"},
+                "parent_id": {"type": "string", "description": "Parent task ID (for subtask)"},
+                "name": {"type": "string", "description": "Task name"},
+                "description": {"type": "string", "description": "Task description"},
+                "progress": {"type": "number", "minimum": 0, "maximum": 1, "description": "Progress 0-1"},
+                "status": {"type": "string", "enum": ["pending", "in_progress", "completed", "failed", "blocked"]},
+                "priority": {"type": "integer", "minimum": 0, "description": "Task priority"},
+                "depends_on": {"type": "string", "description": "Task ID this task depends on"},
+                "layers": {"type": "boolean", "description": "Return the tree as depth layers plus a node map (for get_tree)"},
+                "plan_session_id": {"type": "string"},
+                "act_session_id": {"type": "string"},
+                "tags": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "create_main": ["session_id", "name"],
+                "create_subtask": ["session_id", "parent_id", "name"],
+                "update": ["task_id", "progress"],
+                "get_tree": ["session_id"],
+                "get": ["task_id"],
+                "list": ["session_id"],
+                "add_dependency": ["task_id", "depends_on"],
+                "mark_planned": ["task_id"],
+                "mark_executed": ["task_id"],
+                "get_plan_summary": ["session_id"]
             }
-        ),
-        # Workflow Manager
-        Tool(
-            name="workflow_manager",
-            description="Manage task workflows with parallel execution and dependency tracking",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["create", "execute", "status", "cancel", "get_graph"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "workflow_id": {"type": "string", "description": "Workflow ID"},
-                    "name": {"type": "string", "description": "Workflow name"},
-                    "description": {"type": "string", "description": "Workflow description"},
-                    "root_task_id": {"type": "string", "description": "Root task ID"},
-                    "max_parallel": {"type": "integer", "minimum": 1, "maximum": 16, "default": 4}
+        }
+    ),
+    # Workflow Manager
+    Tool(
+        name="workflow_manager",
+        description="Manage task workflows with parallel execution and dependency tracking",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["create", "execute", "status", "cancel", "get_graph"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "create": ["session_id", "name"],
-                    "execute": ["workflow_id"],
-                    "status": ["workflow_id"],
-                    "cancel": ["workflow_id"],
-                    "get_graph": ["session_id", "root_task_id"]
-                }
+                "session_id": {"type": "string", "description": "Session ID"},
+                "workflow_id": {"type": "string", "description": "Workflow ID"},
+                "name": {"type": "string", "description": "Workflow name"},
+                "description": {"type": "string", "description": "Workflow description"},
+                "root_task_id": {"type": "string", "description": "Root task ID"},
+                "max_parallel": {"type": "integer", "minimum": 1, "maximum": 16,
+                                 "description": "Parallel task limit (defaults to COT_MAX_PAR or the CPU count)"}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "create": ["session_id", "name"],
+                "execute": ["workflow_id"],
+                "status": ["workflow_id"],
+                "cancel": ["workflow_id"],
+                "get_graph": ["session_id", "root_task_id"]
             }
-        ),
-        # Dependency Analyzer
-        Tool(
-            name="dependency_analyzer",
-            description="Analyze and visualize task dependencies, detect cycles, get execution order",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["analyze", "get_order", "get_graph", "detect_cycles", "critical_path"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "root_task_id": {"type": "string", "description": "Root task ID"},
-                    "task_id": {"type": "string", "description": "Specific task ID"},
-                    "auto_infer": {"type": "boolean", "default": True, "description": "Auto-infer dependencies"}
+        }
+    ),
+    # Dependency Analyzer
+    Tool(
+        name="dependency_analyzer",
+        description="Analyze and visualize task dependencies, detect cycles, get execution order",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["analyze", "analyze_status", "get_order", "get_graph", "detect_cycles", "critical_path"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "analyze": ["session_id", "root_task_id"],
-                    "get_order": ["session_id", "root_task_id"],
-                    "get_graph": ["session_id"],
-                    "detect_cycles": ["session_id", "root_task_id"],
-                    "critical_path": ["session_id", "root_task_id"]
-                }
+                "session_id": {"type": "string", "description": "Session ID"},
+                "root_task_id": {"type": "string", "description": "Root task ID"},
+                "task_id": {"type": "string", "description": "Specific task ID"},
+                "analysis_id": {"type": "string", "description": "Handle returned by analyze"},
+                "auto_infer": {"type": "boolean", "default": True, "description": "Auto-infer dependencies"}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "analyze": ["session_id", "root_task_id"],
+                "analyze_status": ["analysis_id"],
+                "get_order": ["session_id", "root_task_id"],
+                "get_graph": ["session_id"],
+                "detect_cycles": ["session_id", "root_task_id"],
+                "critical_path": ["session_id", "root_task_id"]
             }
-        ),
-        # Parallel Executor
-        Tool(
-            name="parallel_executor",
-            description="Execute tasks in parallel with dependency awareness and progress monitoring",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["schedule", "status", "pause", "resume", "cancel"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "root_task_id": {"type": "string", "description": "Root task ID"},
-                    "task_id": {"type": "string", "description": "Task ID (for cancel)"},
-                    "max_parallel": {"type": "integer", "minimum": 1, "maximum": 16, "default": 4}
+        }
+    ),
+    # Parallel Executor
+    Tool(
+        name="parallel_executor",
+        description="Execute tasks in parallel with dependency awareness and progress monitoring",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["schedule", "status", "pause", "resume", "cancel"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "schedule": ["session_id", "root_task_id"],
-                    "status": ["session_id", "root_task_id"],
-                    "cancel": ["task_id"]
-                }
+                "session_id": {"type": "string", "description": "Session ID"},
+                "root_task_id": {"type": "string", "description": "Root task ID"},
+                "task_id": {"type": "string", "description": "Task ID (for cancel)"},
+                "max_parallel": {"type": "integer", "minimum": 1, "maximum": 16,
+                                 "description": "Parallel task limit (defaults to COT_MAX_PAR or the CPU count)"},
+                "work_stealing": {"type": "boolean",
+                                  "description": "Start each task as soon as its dependencies finish instead of in waves"}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "schedule": ["session_id", "root_task_id"],
+                "status": ["session_id", "root_task_id"],
+                "cancel": ["task_id"]
             }
-        ),
-        # Progress Tracker
-        Tool(
-            name="progress_tracker",
-            description="Track task progress with history, predictions, and analytics",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["get", "history", "summary", "predict"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "root_task_id": {"type": "string", "description": "Root task ID"},
-                    "task_id": {"type": "string", "description": "Task ID"},
-                    "limit": {"type": "integer", "minimum": 1, "maximum": 1000, "default": 100}
+        }
+    ),
+    # Progress Tracker
+    Tool(
+        name="progress_tracker",
+        description="Track task progress with history, predictions, and analytics",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["get", "history", "summary", "predict"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "get": ["task_id"],
-                    "history": ["task_id"],
-                    "summary": ["session_id"],
-                    "predict": ["session_id", "root_task_id"]
-                }
+                "session_id": {"type": "string", "description": "Session ID"},
+                "root_task_id": {"type": "string", "description": "Root task ID"},
+                "task_id": {"type": "string", "description": "Task ID"},
+                "limit": {"type": "integer", "minimum": 1, "maximum": 1000, "default": 100}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "get": ["task_id"],
+                "history": ["task_id"],
+                "summary": ["session_id"],
+                "predict": ["session_id", "root_task_id"]
             }
-        ),
-        # Task Decomposer
-        Tool(
-            name="task_decomposer",
-            description="Decompose complex tasks into subtasks with intelligent analysis",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["decompose", "analyze_complexity", "classify", "get_templates"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "task_id": {"type": "string", "description": "Task ID"},
-                    "auto_dependencies": {"type": "boolean", "default": True, "description": "Auto-infer dependencies"}
+        }
+    ),
+    # Task Decomposer
+    Tool(
+        name="task_decomposer",
+        description="Decompose complex tasks into subtasks with intelligent analysis",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["decompose", "analyze_complexity", "classify", "analyze_and_classify", "get_templates"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "decompose": ["session_id", "task_id"],
-                    "analyze_complexity": ["task_id"],
-                    "classify": ["task_id"]
-                }
+                "session_id": {"type": "string", "description": "Session ID"},
+                "task_id": {"type": "string", "description": "Task ID"},
+                "auto_dependencies": {"type": "boolean", "default": True, "description": "Auto-infer dependencies"}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "decompose": ["session_id", "task_id"],
+                "analyze_complexity": ["task_id"],
+                "classify": ["task_id"],
+                "analyze_and_classify": ["task_id"]
             }
-        ),
-        # Design Planner (Refactored - LLM-based)
-        Tool(
-            name="design_planner",
-            description="Generate High-Level Design (HLD) and Low-Level Design (LLD) using AI",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["create_hld", "create_lld", "generate", "get_design"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "task_id": {"type": "string", "description": "Task ID"},
-                    "model": {"type": "string", "enum": ["auto", "gpt-4", "claude", "local"], "default": "auto",
-                              "description": "AI model to use (auto = best available)"},
-                    "detail_level": {"type": "string", "enum": ["high", "medium", "low"], "default": "medium"},
-                    "include_diagrams": {"type": "boolean", "default": True}
+        }
+    ),
+    # Design Planner (Refactored - LLM-based)
+    Tool(
+        name="design_planner",
+        description="Generate High-Level Design (HLD) and Low-Level Design (LLD) using AI",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["create_hld", "create_lld", "generate", "get_design"],
+                    "description": "Action to perform"
                 },
-                "required": ["action", "session_id", "task_id"]
-            }
-        ),
-        # Memory Operations
-        Tool(
-            name="memory_ops",
-            description="Store and retrieve long-term and short-term memory",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["store_long", "retrieve_long", "store_short", "get_short", 
-                                  "push_context", "push_action", "clear_short"],
-                        "description": "Action to perform"
-                    },
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "memory_type": {"type": "string", "enum": ["knowledge", "insight", "pattern", "context"]},
-                    "content": {"type": "object", "description": "Memory content"},
-                    "tags": {"type": "array", "items": {"type": "string"}},
-                    "confidence": {"type": "number", "minimum": 0, "maximum": 1, "default": 1.0},
-                    "query": {"type": "string", "description": "Search query for retrieval"},
-                    "limit": {"type": "integer", "minimum": 1, "maximum": 100, "default": 10},
-                    "action_data": {"type": "object", "description": "Action data to push"},
-                    "active_context": {"type": "object"},
-                    "recent_actions": {"type": "array"},
-                    "focus_area": {"type": "string"},
-                    "temporary_state": {"type": "object"}
+                "session_id": {"type": "string", "description": "Session ID"},
+                "task_id": {"type": "string", "description": "Task ID"},
+                "model": {"type": "string", "enum": ["auto", "gpt-4", "claude", "local"], "default": "auto",
+                          "description": "AI model to use (auto = best available)"},
+                "detail_level": {"type": "string", "enum": ["high", "medium", "low"], "default": "medium"},
+                "include_diagrams": {"type": "boolean", "default": True}
+            },
+            "required": ["action", "session_id", "task_id"]
+        }
+    ),
+    # Memory Operations
+    Tool(
+        name="memory_ops",
+        description="Store and retrieve long-term and short-term memory",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["store_long", "retrieve_long", "store_short", "get_short", 
+                              "push_context", "push_action", "clear_short"],
+                    "description": "Action to perform"
                 },
-                "required": ["action", "session_id"],
-                "dependencies": {
-                    "store_long": ["session_id", "memory_type", "content"],
-                    "retrieve_long": ["session_id", "query"],
-                    "store_short": ["session_id"],
-                    "push_context": ["session_id"],
-                    "push_action": ["session_id"],
-                    "clear_short": ["session_id"]
-                }
+                "session_id": {"type": "string", "description": "Session ID"},
+                "memory_type": {"type": "string", "enum": ["knowledge", "insight", "pattern", "context"]},
+                "content": {"type": "object", "description": "Memory content"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "confidence": {"type": "number", "minimum": 0, "maximum": 1, "default": 1.0},
+                "query": {"type": "string", "description": "Search query for retrieval"},
+                "limit": {"type": "integer", "minimum": 1, "maximum": 100, "default": 10},
+                "action_data": {"type": "object", "description": "Action data to push"},
+                "active_context": {"type": "object"},
+                "recent_actions": {"type": "array"},
+                "focus_area": {"type": "string"},
+                "temporary_state": {"type": "object"}
+            },
+            "required": ["action", "session_id"],
+            "dependencies": {
+                "store_long": ["session_id", "memory_type", "content"],
+                "retrieve_long": ["session_id", "query"],
+                "store_short": ["session_id"],
+                "push_context": ["session_id"],
+                "push_action": ["session_id"],
+                "clear_short": ["session_id"]
             }
-        ),
-        # Checkpoint Operations
-        Tool(
-            name="checkpoint_ops",
-            description="Create and manage multi-level checkpoints with diff and restore",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["create", "list", "get", "restore", "diff", "cleanup"],
-                        "description": "Action to perform"
-                    },
-                    "level": {"type": "string", "enum": ["overall", "subtask", "stage"]},
-                    "session_id": {"type": "string", "description": "Session ID"},
-                    "task_id": {"type": "string", "description": "Task ID (for subtask/stage)"},
-                    "checkpoint_id": {"type": "string", "description": "Checkpoint ID"},
-                    "checkpoint_id_2": {"type": "string", "description": "Second checkpoint for diff"},
-                    "tags": {"type": "array", "items": {"type": "string"}},
-                    "metadata": {"type": "object"},
-                    "stage_name": {"type": "string", "description": "Stage name (for stage level)"},
-                    "keep_last": {"type": "integer", "minimum": 1, "default": 10},
-                    "limit": {"type": "integer", "minimum": 1, "maximum": 100, "default": 50}
+        }
+    ),
+    # Checkpoint Operations
+    Tool(
+        name="checkpoint_ops",
+        description="Create and manage multi-level checkpoints with diff and restore",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["create", "await", "list", "get", "restore", "diff", "cleanup"],
+                    "description": "Action to perform"
                 },
-                "required": ["action"],
-                "dependencies": {
-                    "create": ["level", "session_id"],
-                    "get": ["checkpoint_id"],
-                    "restore": ["session_id", "checkpoint_id"]
-                }
+                "level": {"type": "string", "enum": ["overall", "subtask", "stage"]},
+                "session_id": {"type": "string", "description": "Session ID"},
+                "task_id": {"type": "string", "description": "Task ID (for subtask/stage)"},
+                "checkpoint_id": {"type": "string", "description": "Checkpoint ID"},
+                "checkpoint_id_2": {"type": "string", "description": "Second checkpoint for diff"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "metadata": {"type": "object"},
+                "stage_name": {"type": "string", "description": "Stage name (for stage level)"},
+                "background": {"type": "boolean", "description": "Return a pending checkpoint_id at once (for create; join with await)"},
+                "keep_last": {"type": "integer", "minimum": 1, "default": 10},
+                "limit": {"type": "integer", "minimum": 1, "maximum": 100, "default": 50}
+            },
+            "required": ["action"],
+            "dependencies": {
+                "create": ["level", "session_id"],
+                "get": ["checkpoint_id"],
+                "restore": ["session_id", "checkpoint_id"]
             }
-        ),
-        # System Stats
-        Tool(
-            name="system_stats",
-            description="Get comprehensive system statistics and health metrics",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "include_health": {"type": "boolean", "default": True, "description": "Include health check"},
-                    "include_storage": {"type": "boolean", "default": True, "description": "Include storage metrics"}
+        }
+    ),
+    # Batch Operations
+    Tool(
+        name="batch_ops",
+        description="Run several tool calls in one request - items whose dependencies are met run concurrently",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string", "description": "Item ID for depends_on (defaults to its index)"},
+                            "name": {"type": "string", "description": "Tool name"},
+                            "action": {"type": "string", "description": "Tool action"},
+                            "args": {"type": "object", "description": "Tool arguments"},
+                            "depends_on": {"type": "array", "items": {"type": "string"},
+                                           "description": "IDs of items that must finish first"}
+                        },
+                        "required": ["name"]
+                    }
                 }
+            },
+            "required": ["items"]
+        }
+    ),
+    # System Stats
+    Tool(
+        name="system_stats",
+        description="Get comprehensive system statistics and health metrics",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "include_health": {"type": "boolean", "default": True, "description": "Include health check"},
+                "include_storage": {"type": "boolean", "default": True, "description": "Include storage metrics"}
             }
-        )
-    ]
+        }
+    )
+]
+
+# Every tool with actions also accepts "bulk": a list of subcalls run concurrently
+for _tool in _TOOLS_LIST:
+    _properties = _tool.inputSchema["properties"]
+    if "action" in _properties:
+        _properties["action"]["enum"].append("bulk")
+        _properties["subcalls"] = {
+            "type": "array",
+            "items": {"type": "object"},
+            "description": "Argument objects for each subcall (bulk action)"
+        }
+
+# Validators are built once from the final schemas; mcp's default path re-checks
+# the schema itself on every call before validating the arguments
+_VALIDATORS = {
+    tool.name: jsonschema.Draft7Validator(tool.inputSchema) for tool in _TOOLS_LIST
+}
+
+def _schema_error(name: str, arguments: Any) -> Optional[str]:
+    """First input-schema violation in a tool's arguments, or None if they are valid."""
+    validator = _VALIDATORS.get(name)
+    if validator is None:
+        return None
+    error = jsonschema.exceptions.best_match(validator.iter_errors(arguments))
+    return None if error is None else f"Input validation error: {error.message}"
+
+@app.list_tools()
+async def list_tools():
+    """List all available tools with proper schemas."""
+    # mcp only iterates the list to refresh its tool cache - no per-call copy needed
+    return _TOOLS_LIST
 
 async def validate_input(action: str, arguments: Dict[str, Any], required: List[str]) -> Optional[str]:
     """Validate required arguments."""
@@ -366,602 +620,986 @@ async def validate_input(action: str, arguments: Dict[str, Any], required: List[
         return f"Missing required arguments for action '{action}': {', '.join(missing)}"
     return None
 
-@app.call_tool()
-async def call_tool(name: str, arguments: Dict[str, Any]):
-    """Handle tool calls with proper error handling and validation."""
-    mem = get_memory()
-    orch = get_orchestration()
+
+def _text(payload: Any) -> List[TextContent]:
+    """Wrap a JSON payload as the tool response."""
+    return [TextContent(type="text", text=_dumps(payload))]
+
+
+def _success(success: Any) -> List[TextContent]:
+    """Return the pre-encoded success/failure response for a boolean result."""
+    if success is True:
+        return _OK
+    if success is False:
+        return _FAIL
+    return _text({"success": success})
+
+
+# tool -> action -> async handler taking the call arguments. Built once at import.
+# Routing is two hash lookups on source literals (already interned) - no chain of
+# string comparisons, and no key tuple to build per call.
+HANDLERS: Dict[str, Dict[str, Callable[[Dict[str, Any]], Awaitable[List[TextContent]]]]] = {}
+
+
+# Per-session locks for memory_ops writes, evicted least-recently-used.
+# Handlers all run on the event loop, so first-touch creation needs no extra lock.
+_SESSION_LOCKS: "OrderedDict[str, asyncio.Lock]" = OrderedDict()
+_MAX_SESSION_LOCKS = 1024
+
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    """Get the lock serializing writes for one session."""
+    lock = _SESSION_LOCKS.get(session_id)
+    if lock is not None:
+        _SESSION_LOCKS.move_to_end(session_id)
+        return lock
     
-    try:
-        # Session Manager
-        if name == "session_manager":
-            action = arguments["action"]
-            
-            if action == "create":
-                error = await validate_input(action, arguments, ["name"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                session_id = mem.sessions.create(
-                    arguments["name"],
-                    arguments.get("metadata"),
-                    arguments.get("mode", "plan")
-                )
-                return [TextContent(type="text", text=json.dumps({"session_id": session_id, "status": "created"}))]
-            
-            elif action == "list":
-                sessions = mem.sessions.list(arguments.get("status"))
-                return [TextContent(type="text", text=json.dumps({"sessions": sessions, "count": len(sessions)}))]
-            
-            elif action == "get":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                session = mem.sessions.get(arguments["session_id"])
-                if not session:
-                    return [TextContent(type="text", text=json.dumps({"error": "Session not found"}))]
-                return [TextContent(type="text", text=json.dumps(session))]
-            
-            elif action == "update":
-                error = await validate_input(action, arguments, ["session_id", "status"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                success = mem.sessions.update(arguments["session_id"], arguments["status"])
-                return [TextContent(type="text", text=json.dumps({"success": success}))]
-            
-            elif action in ["close", "archive"]:
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                success = mem.sessions.archive(arguments["session_id"])
-                return [TextContent(type="text", text=json.dumps({"success": success}))]
-            
-            elif action == "set_mode":
-                error = await validate_input(action, arguments, ["session_id", "mode"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.sessions.set_mode(arguments["session_id"], arguments["mode"])
-                return [TextContent(type="text", text=json.dumps({"success": True, "mode": arguments["mode"]}))]
-            
-            elif action == "get_mode":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mode = mem.sessions.get_mode(arguments["session_id"])
-                return [TextContent(type="text", text=json.dumps({"mode": mode}))]
-        
-        # Task Manager
-        elif name == "task_manager":
-            action = arguments["action"]
-            
-            if action == "create_main":
-                error = await validate_input(action, arguments, ["session_id", "name"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                task_id = mem.tasks.create_main_task(
-                    arguments["session_id"],
-                    arguments["name"],
-                    arguments.get("description", ""),
-                    arguments.get("priority", 0),
-                    arguments.get("tags", [])
-                )
-                return [TextContent(type="text", text=json.dumps({"task_id": task_id, "status": "created"}))]
-            
-            elif action == "create_subtask":
-                error = await validate_input(action, arguments, ["session_id", "parent_id", "name"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                task_id = mem.tasks.create_subtask(
-                    arguments["session_id"],
-                    arguments["parent_id"],
-                    arguments["name"],
-                    arguments.get("description", ""),
-                    arguments.get("priority", 0)
-                )
-                return [TextContent(type="text", text=json.dumps({"task_id": task_id, "status": "created"}))]
-            
-            elif action == "update":
-                error = await validate_input(action, arguments, ["task_id", "progress"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.tasks.update_progress(
-                    arguments["task_id"],
-                    arguments["progress"],
-                    arguments.get("status")
-                )
-                return [TextContent(type="text", text=json.dumps({"success": True, "task_id": arguments["task_id"]}))]
-            
-            elif action == "get_tree":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                tree = mem.tasks.get_tree(arguments["session_id"], arguments.get("root_task_id"))
-                return [TextContent(type="text", text=json.dumps(tree or {}))]
-            
-            elif action == "get":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                task = mem.tasks.get(arguments["task_id"])
-                if not task:
-                    return [TextContent(type="text", text=json.dumps({"error": "Task not found"}))]
-                return [TextContent(type="text", text=json.dumps(task))]
-            
-            elif action == "add_dependency":
-                error = await validate_input(action, arguments, ["task_id", "depends_on"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                success = mem.tasks.add_dependency(arguments["task_id"], arguments["depends_on"])
-                return [TextContent(type="text", text=json.dumps({"success": success}))]
-            
-            elif action == "mark_planned":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.tasks.mark_as_planned(
-                    arguments["task_id"],
-                    arguments.get("plan_session_id", arguments.get("session_id"))
-                )
-                return [TextContent(type="text", text=json.dumps({"success": True, "planned": True}))]
-            
-            elif action == "mark_executed":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.tasks.mark_as_executed(
-                    arguments["task_id"],
-                    arguments.get("act_session_id", arguments.get("session_id"))
-                )
-                return [TextContent(type="text", text=json.dumps({"success": True, "executed": True}))]
-            
-            elif action == "get_plan_summary":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                summary = mem.tasks.get_plan_act_summary(arguments["session_id"])
-                return [TextContent(type="text", text=json.dumps(summary))]
-        
-        # Workflow Manager
-        elif name == "workflow_manager":
-            action = arguments["action"]
-            
-            if action == "create":
-                error = await validate_input(action, arguments, ["session_id", "name"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                workflow_id = await orch.create_workflow(
-                    arguments["session_id"],
-                    arguments["name"],
-                    arguments.get("description", "")
-                )
-                return [TextContent(type="text", text=json.dumps({"workflow_id": workflow_id, "status": "created"}))]
-            
-            elif action == "execute":
-                error = await validate_input(action, arguments, ["workflow_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                result = await orch.execute_workflow(arguments["workflow_id"])
-                return [TextContent(type="text", text=json.dumps(result))]
-            
-            elif action == "status":
-                error = await validate_input(action, arguments, ["workflow_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                status = orch.get_workflow_status(arguments["workflow_id"])
-                return [TextContent(type="text", text=json.dumps(status or {"error": "Workflow not found"}))]
-            
-            elif action == "cancel":
-                error = await validate_input(action, arguments, ["workflow_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                await orch.cancel_workflow(arguments["workflow_id"])
-                return [TextContent(type="text", text=json.dumps({"success": True, "status": "cancelled"}))]
-            
-            elif action == "get_graph":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                graph = orch.get_dependency_graph(arguments["session_id"], arguments.get("root_task_id"))
-                return [TextContent(type="text", text=json.dumps(graph))]
-        
-        # Dependency Analyzer
-        elif name == "dependency_analyzer":
-            action = arguments["action"]
-            
-            if action == "analyze":
-                error = await validate_input(action, arguments, ["session_id", "root_task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                result = await orch.dependency_agent.analyze_dependencies(
-                    arguments["session_id"],
-                    arguments["root_task_id"],
-                    arguments.get("auto_infer", True)
-                )
-                return [TextContent(type="text", text=json.dumps(result))]
-            
-            elif action == "get_order":
-                error = await validate_input(action, arguments, ["session_id", "root_task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                order = orch.dependency_agent.get_execution_order()
-                return [TextContent(type="text", text=json.dumps({"execution_order": order}))]
-            
-            elif action == "get_graph":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                graph = orch.dependency_agent.get_dependency_graph(
-                    arguments["session_id"],
-                    arguments.get("root_task_id")
-                )
-                return [TextContent(type="text", text=json.dumps(graph))]
-            
-            elif action == "detect_cycles":
-                error = await validate_input(action, arguments, ["session_id", "root_task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                cycles = orch.dependency_agent.detect_circular_dependencies(
-                    arguments["session_id"],
-                    arguments["root_task_id"]
-                )
-                return [TextContent(type="text", text=json.dumps({"cycles": cycles, "has_cycles": len(cycles) > 0}))]
-            
-            elif action == "critical_path":
-                error = await validate_input(action, arguments, ["session_id", "root_task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                critical = orch.dependency_agent.get_critical_path()
-                return [TextContent(type="text", text=json.dumps(critical))]
-        
-        # Parallel Executor
-        elif name == "parallel_executor":
-            action = arguments["action"]
-            executor = orch.execution_agent
-            
-            if action == "schedule":
-                error = await validate_input(action, arguments, ["session_id", "root_task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                result = await executor.schedule_tasks(
-                    arguments["session_id"],
-                    arguments.get("root_task_id"),
-                    arguments.get("max_parallel", 4)
-                )
-                return [TextContent(type="text", text=json.dumps(result))]
-            
-            elif action == "status":
-                status = executor.get_execution_status()
-                return [TextContent(type="text", text=json.dumps(status))]
-            
-            elif action == "pause":
-                await executor.pause_execution()
-                return [TextContent(type="text", text=json.dumps({"success": True, "status": "paused"}))]
-            
-            elif action == "resume":
-                await executor.resume_execution()
-                return [TextContent(type="text", text=json.dumps({"success": True, "status": "resumed"}))]
-            
-            elif action == "cancel":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                await executor.cancel_task(arguments["task_id"])
-                return [TextContent(type="text", text=json.dumps({"success": True, "task_id": arguments["task_id"]}))]
-        
-        # Progress Tracker
-        elif name == "progress_tracker":
-            action = arguments["action"]
-            tracker = mem.progress_tracker
-            
-            if action == "get":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                progress = tracker.get_current_progress(arguments["task_id"])
-                return [TextContent(type="text", text=json.dumps(progress or {"task_id": arguments["task_id"], "progress": 0}))]
-            
-            elif action == "history":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                history = tracker.get_history(arguments["task_id"], arguments.get("limit", 100))
-                return [TextContent(type="text", text=json.dumps({"history": history, "count": len(history)}))]
-            
-            elif action == "summary":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                summary = tracker.get_progress_summary(arguments["session_id"], arguments.get("root_task_id"))
-                return [TextContent(type="text", text=json.dumps(summary))]
-            
-            elif action == "predict":
-                error = await validate_input(action, arguments, ["session_id", "root_task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                prediction = tracker.predict_completion(arguments["session_id"], arguments["root_task_id"])
-                return [TextContent(type="text", text=json.dumps(prediction))]
-        
-        # Task Decomposer
-        elif name == "task_decomposer":
-            action = arguments["action"]
-            decomp = orch.decomposition_agent
-            
-            if action == "decompose":
-                error = await validate_input(action, arguments, ["session_id", "task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                subtask_ids = await decomp.decompose_task(
-                    arguments["session_id"],
-                    arguments["task_id"],
-                    arguments.get("auto_dependencies", True)
-                )
-                return [TextContent(type="text", text=json.dumps({"subtasks": subtask_ids, "count": len(subtask_ids)}))]
-            
-            elif action == "analyze_complexity":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                task = mem.tasks.get(arguments["task_id"])
-                if not task:
-                    return [TextContent(type="text", text=json.dumps({"error": "Task not found"}))]
-                complexity = decomp.analyze_complexity(task)
-                return [TextContent(type="text", text=json.dumps({"complexity": complexity}))]
-            
-            elif action == "classify":
-                error = await validate_input(action, arguments, ["task_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                task = mem.tasks.get(arguments["task_id"])
-                if not task:
-                    return [TextContent(type="text", text=json.dumps({"error": "Task not found"}))]
-                task_type = decomp.classify_task(task)
-                return [TextContent(type="text", text=json.dumps({"task_type": task_type}))]
-            
-            elif action == "get_templates":
-                templates = decomp.SUBTASK_TEMPLATES
-                return [TextContent(type="text", text=json.dumps({"templates": templates}))]
-        
-        # Design Planner (Refactored)
-        elif name == "design_planner":
-            action = arguments["action"]
-            session_id = arguments.get("session_id")
-            task_id = arguments.get("task_id")
-            
-            error = await validate_input(action, arguments, ["session_id", "task_id"])
-            if error:
-                return [TextContent(type="text", text=json.dumps({"error": error}))]
-            
-            task = mem.tasks.get(task_id)
-            if not task:
-                return [TextContent(type="text", text=json.dumps({"error": "Task not found"}))]
-            
-            # Get configuration
-            detail_level = arguments.get("detail_level", "medium")
-            include_diagrams = arguments.get("include_diagrams", True)
-            
-            if action == "create_hld":
-                from memory_store_v2.agents.design_planner_agent import DesignPlannerAgent
-                agent = DesignPlannerAgent(mem.tasks)
-                result = await agent.create_hld(session_id, task_id, detail_level, include_diagrams)
-                return [TextContent(type="text", text=json.dumps(result))]
-            
-            elif action == "create_lld":
-                from memory_store_v2.agents.design_planner_agent import DesignPlannerAgent
-                agent = DesignPlannerAgent(mem.tasks)
-                result = await agent.create_lld(session_id, task_id, detail_level, include_diagrams)
-                return [TextContent(type="text", text=json.dumps(result))]
-            
-            elif action == "generate":
-                from memory_store_v2.agents.design_planner_agent import DesignPlannerAgent
-                agent = DesignPlannerAgent(mem.tasks)
-                result = await agent.generate_complete_design(session_id, task_id, detail_level, include_diagrams)
-                return [TextContent(type="text", text=json.dumps(result))]
-            
-            elif action == "get_design":
-                metadata = json.loads(task.get('metadata', '{}') or '{}')
-                hld = metadata.get('hld')
-                lld = metadata.get('lld')
-                return [TextContent(type="text", text=json.dumps({
-                    "has_hld": hld is not None,
-                    "has_lld": lld is not None,
-                    "hld": hld,
-                    "lld": lld
-                }))]
+    lock = _SESSION_LOCKS[session_id] = asyncio.Lock()
+    if len(_SESSION_LOCKS) > _MAX_SESSION_LOCKS:
+        for sid, old in _SESSION_LOCKS.items():
+            if not old.locked():
+                del _SESSION_LOCKS[sid]
+                break
+    return lock
+
+
+def handler(tool: str, *actions: str, required: Tuple[str, ...] = (),
+            session_lock: bool = False, io_bound: bool = False):
+    """
+    Register a handler for one or more actions of a tool.
+    
+    Args:
+        tool: Tool name
+        actions: Actions served by the handler ("" for tools without actions)
+        required: Arguments checked with validate_input before the call
+        session_lock: Serialize calls per session_id; other sessions run in parallel
+        io_bound: The handler is a plain function doing blocking store I/O, run
+            on the writer thread instead of the event loop
+    """
+    # The wrapper is specialized once here for the handler's shape, so a call pays
+    # a single frame with a plain key loop - the message is only built on a miss
+    keys = tuple(required)
+    
+    def register(fn):
+        call = fn
+        if io_bound:
+            @functools.wraps(fn)
+            async def call(arguments: Dict[str, Any]) -> List[TextContent]:
+                return await _offload(fn, arguments)
         
-        # Memory Operations
-        elif name == "memory_ops":
-            action = arguments["action"]
-            session_id = arguments["session_id"]
-            
-            if action == "store_long":
-                error = await validate_input(action, arguments, ["session_id", "memory_type", "content"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                memory_id = mem.memory.store_long_term(
-                    session_id,
-                    arguments["memory_type"],
-                    arguments["content"],
-                    arguments.get("tags"),
-                    arguments.get("confidence", 1.0)
-                )
-                return [TextContent(type="text", text=json.dumps({"memory_id": memory_id, "status": "stored"}))]
-            
-            elif action == "retrieve_long":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                results = mem.memory.retrieve_long_term(
-                    session_id,
-                    arguments.get("query"),
-                    arguments.get("memory_type"),
-                    arguments.get("limit", 10)
-                )
-                return [TextContent(type="text", text=json.dumps({"results": results, "count": len(results)}))]
-            
-            elif action == "store_short":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.memory.store_short_term(
-                    session_id,
-                    arguments.get("active_context"),
-                    arguments.get("recent_actions"),
-                    arguments.get("focus_area"),
-                    arguments.get("temporary_state")
-                )
-                return [TextContent(type="text", text=json.dumps({"success": True, "stored": "short_term"}))]
-            
-            elif action == "get_short":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                result = mem.memory.get_short_term(session_id)
-                return [TextContent(type="text", text=json.dumps(result or {}))]
-            
-            elif action == "push_context":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.memory.push_context(session_id, arguments.get("content", {}))
-                return [TextContent(type="text", text=json.dumps({"success": True}))]
-            
-            elif action == "push_action":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.memory.push_action(session_id, arguments.get("action_data", {}))
-                return [TextContent(type="text", text=json.dumps({"success": True}))]
-            
-            elif action == "clear_short":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                mem.memory.clear_short_term(session_id)
-                return [TextContent(type="text", text=json.dumps({"success": True}))]
+        if keys and session_lock:
+            @functools.wraps(fn)
+            async def target(arguments: Dict[str, Any]) -> List[TextContent]:
+                for key in keys:
+                    if arguments.get(key) is None:
+                        return _text({"error": await validate_input(arguments.get("action"), arguments, list(keys))})
+                async with _session_lock(arguments["session_id"]):
+                    return await call(arguments)
+        elif keys:
+            @functools.wraps(fn)
+            async def target(arguments: Dict[str, Any]) -> List[TextContent]:
+                for key in keys:
+                    if arguments.get(key) is None:
+                        return _text({"error": await validate_input(arguments.get("action"), arguments, list(keys))})
+                return await call(arguments)
+        elif session_lock:
+            @functools.wraps(fn)
+            async def target(arguments: Dict[str, Any]) -> List[TextContent]:
+                async with _session_lock(arguments["session_id"]):
+                    return await call(arguments)
+        else:
+            target = call
+        for action in actions:
+            HANDLERS.setdefault(tool, {})[action] = target
+        return fn
+    return register
+
+
+# Session Manager
+@handler("session_manager", "create", required=("name",), io_bound=True)
+def _session_create(arguments):
+    session_id = get_memory().sessions.create(
+        arguments["name"],
+        arguments.get("metadata"),
+        arguments.get("mode", "plan")
+    )
+    return _text({"session_id": session_id, "status": "created"})
+
+@handler("session_manager", "list")
+async def _session_list(arguments):
+    status = arguments.get("status")
+    
+    async def produce():
+        sessions = await _read(get_memory().sessions.list, status)
+        return _text({"sessions": sessions, "count": len(sessions)})
+    
+    return await _cached_read(("session_list", status, get_memory().sessions.version), produce)
+
+@handler("session_manager", "get", required=("session_id",))
+async def _session_get(arguments):
+    session = get_session(arguments["session_id"])
+    if not session:
+        return _SESSION_NOT_FOUND
+    return _text(session)
+
+@handler("session_manager", "update", required=("session_id", "status"), io_bound=True)
+def _session_update(arguments):
+    success = get_memory().sessions.update(arguments["session_id"], arguments["status"])
+    return _success(success)
+
+@handler("session_manager", "close", "archive", required=("session_id",), io_bound=True)
+def _session_archive(arguments):
+    success = get_memory().sessions.archive(arguments["session_id"])
+    return _success(success)
+
+@handler("session_manager", "set_mode", required=("session_id", "mode"), io_bound=True)
+def _session_set_mode(arguments):
+    get_memory().sessions.set_mode(arguments["session_id"], arguments["mode"])
+    return _text({"success": True, "mode": arguments["mode"]})
+
+@handler("session_manager", "get_mode", required=("session_id",))
+async def _session_get_mode(arguments):
+    mode = await _read(get_memory().sessions.get_mode, arguments["session_id"])
+    return _text({"mode": mode})
+
+
+# Task Manager
+@handler("task_manager", "create_main", required=("session_id", "name"), io_bound=True)
+def _task_create_main(arguments):
+    task_id = get_memory().tasks.create_main_task(
+        arguments["session_id"],
+        arguments["name"],
+        arguments.get("description", ""),
+        arguments.get("priority", 0),
+        arguments.get("tags", [])
+    )
+    return _text({"task_id": task_id, "status": "created"})
+
+@handler("task_manager", "create_subtask", required=("session_id", "parent_id", "name"), io_bound=True)
+def _task_create_subtask(arguments):
+    task_id = get_memory().tasks.create_subtask(
+        arguments["session_id"],
+        arguments["parent_id"],
+        arguments["name"],
+        arguments.get("description", ""),
+        arguments.get("priority", 0)
+    )
+    return _text({"task_id": task_id, "status": "created"})
+
+class _UpdateArgs:
+    """Parsed arguments for the hot task_manager/update action."""
+    __slots__ = ("task_id", "progress", "status")
+    
+    def __init__(self, arguments: Dict[str, Any]):
+        self.task_id = arguments["task_id"]
+        self.progress = arguments["progress"]
+        self.status = arguments.get("status")
+
+@handler("task_manager", "update", required=("task_id", "progress"), io_bound=True)
+def _task_update(arguments):
+    args = _UpdateArgs(arguments)
+    get_memory().tasks.update_progress(args.task_id, args.progress, args.status)
+    return _text({"success": True, "task_id": args.task_id})
+
+@handler("task_manager", "get_tree", required=("session_id",))
+async def _task_get_tree(arguments):
+    tasks = get_memory().tasks
+    layers = bool(arguments.get("layers"))
+    session_id, root_task_id = arguments["session_id"], arguments.get("root_task_id")
+    
+    async def produce():
+        fetch = tasks.get_layers if layers else tasks.get_tree
+        tree = await _read(fetch, session_id, root_task_id)
+        return _text(tree or {})
+    
+    return await _cached_read(("get_tree", session_id, root_task_id, layers, tasks.version), produce)
+
+@handler("task_manager", "get", required=("task_id",))
+async def _task_get(arguments):
+    task = get_task(arguments["task_id"])
+    if not task:
+        return _TASK_NOT_FOUND
+    return _text(task)
+
+@handler("task_manager", "add_dependency", required=("task_id", "depends_on"), io_bound=True)
+def _task_add_dependency(arguments):
+    success = get_memory().tasks.add_dependency(arguments["task_id"], arguments["depends_on"])
+    return _success(success)
+
+@handler("task_manager", "mark_planned", required=("task_id",), io_bound=True)
+def _task_mark_planned(arguments):
+    get_memory().tasks.mark_as_planned(
+        arguments["task_id"],
+        arguments.get("plan_session_id", arguments.get("session_id"))
+    )
+    return _PLANNED
+
+@handler("task_manager", "mark_executed", required=("task_id",), io_bound=True)
+def _task_mark_executed(arguments):
+    get_memory().tasks.mark_as_executed(
+        arguments["task_id"],
+        arguments.get("act_session_id", arguments.get("session_id"))
+    )
+    return _EXECUTED
+
+@handler("task_manager", "get_plan_summary", required=("session_id",))
+async def _task_plan_summary(arguments):
+    summary = await _read(get_memory().tasks.get_plan_act_summary, arguments["session_id"])
+    return _text(summary)
+
+
+# Workflow Manager
+@handler("workflow_manager", "create", required=("session_id", "name"))
+async def _workflow_create(arguments):
+    workflow_id = await get_orchestration().create_workflow(
+        arguments["session_id"],
+        arguments["name"],
+        arguments.get("description", "")
+    )
+    return _text({"workflow_id": workflow_id, "status": "created"})
+
+@handler("workflow_manager", "execute", required=("workflow_id",))
+async def _workflow_execute(arguments):
+    result = await get_orchestration().execute_workflow(arguments["workflow_id"])
+    return _text(result)
+
+@handler("workflow_manager", "status", required=("workflow_id",))
+async def _workflow_status(arguments):
+    status = get_orchestration().get_workflow_status(arguments["workflow_id"])
+    return _text(status or {"error": "Workflow not found"})
+
+@handler("workflow_manager", "cancel", required=("workflow_id",))
+async def _workflow_cancel(arguments):
+    await get_orchestration().cancel_workflow(arguments["workflow_id"])
+    return _CANCELLED
+
+@functools.lru_cache(maxsize=128)
+def _cached_graph(session_id: str, root_task_id: Optional[str], version: int) -> List[TextContent]:
+    """Dependency graph response, memoized until the task store changes."""
+    graph = get_orchestration().dependency_agent.get_dependency_graph(session_id, root_task_id)
+    return _text(graph)
+
+@handler("workflow_manager", "get_graph", required=("session_id",))
+async def _workflow_get_graph(arguments):
+    return _cached_graph(arguments["session_id"], arguments.get("root_task_id"),
+                         get_memory().tasks.version)
+
+
+# Dependency Analyzer
+# Background dependency analyses keyed by analysis_id
+_ANALYSES: Dict[str, asyncio.Task] = {}
+_MAX_ANALYSES = 100
+
+@handler("dependency_analyzer", "analyze", required=("session_id", "root_task_id"))
+async def _deps_analyze(arguments):
+    # Forget the oldest finished analyses once the registry is full
+    if len(_ANALYSES) >= _MAX_ANALYSES:
+        for analysis_id in [a for a, t in _ANALYSES.items() if t.done()][:len(_ANALYSES) - _MAX_ANALYSES + 1]:
+            del _ANALYSES[analysis_id]
+    
+    analysis_id = f"analysis_{uuid.uuid4().hex[:8]}"
+    _ANALYSES[analysis_id] = asyncio.create_task(
+        get_orchestration().dependency_agent.analyze_dependencies(
+            arguments["session_id"],
+            arguments["root_task_id"],
+            arguments.get("auto_infer", True)
+        )
+    )
+    return _text({"analysis_id": analysis_id, "status": "running"})
+
+@handler("dependency_analyzer", "analyze_status", required=("analysis_id",))
+async def _deps_analyze_status(arguments):
+    analysis_id = arguments["analysis_id"]
+    task = _ANALYSES.get(analysis_id)
+    if task is None:
+        return _text({"error": "Analysis not found"})
+    if not task.done():
+        return _text({"analysis_id": analysis_id, "done": False, "status": "running"})
+    if task.cancelled():
+        return _text({"analysis_id": analysis_id, "done": True, "status": "cancelled"})
+    if task.exception() is not None:
+        return _text({"analysis_id": analysis_id, "done": True, "status": "failed",
+                      "error": str(task.exception())})
+    return _text({"analysis_id": analysis_id, "done": True, "status": "completed",
+                  "result": task.result()})
+
+@handler("dependency_analyzer", "get_order", required=("session_id", "root_task_id"))
+async def _deps_get_order(arguments):
+    order = get_orchestration().dependency_agent.get_execution_order()
+    return _text({"execution_order": order})
+
+@handler("dependency_analyzer", "get_graph", required=("session_id",))
+async def _deps_get_graph(arguments):
+    return _cached_graph(arguments["session_id"], arguments.get("root_task_id"),
+                         get_memory().tasks.version)
+
+@functools.lru_cache(maxsize=128)
+def _cached_cycles(session_id: str, root_task_id: str, version: int) -> List[TextContent]:
+    """Cycle detection response, memoized until the task store changes."""
+    cycles = get_orchestration().dependency_agent.detect_circular_dependencies(session_id, root_task_id)
+    return _text({"cycles": cycles, "has_cycles": len(cycles) > 0})
+
+@handler("dependency_analyzer", "detect_cycles", required=("session_id", "root_task_id"))
+async def _deps_detect_cycles(arguments):
+    return _cached_cycles(arguments["session_id"], arguments["root_task_id"],
+                          get_memory().tasks.version)
+
+@handler("dependency_analyzer", "critical_path", required=("session_id", "root_task_id"))
+async def _deps_critical_path(arguments):
+    critical = get_orchestration().dependency_agent.get_critical_path()
+    return _text(critical)
+
+
+# Parallel Executor
+@handler("parallel_executor", "schedule", required=("session_id", "root_task_id"))
+async def _exec_schedule(arguments):
+    result = await get_orchestration().execution_agent.schedule_independent(
+        arguments["session_id"],
+        arguments.get("root_task_id"),
+        arguments.get("max_parallel"),
+        arguments.get("work_stealing")
+    )
+    return _text(result)
+
+@handler("parallel_executor", "status")
+async def _exec_status(arguments):
+    status = get_orchestration().execution_agent.get_execution_status()
+    return _text(status)
+
+@handler("parallel_executor", "pause")
+async def _exec_pause(arguments):
+    await get_orchestration().execution_agent.pause_execution()
+    return _PAUSED
+
+@handler("parallel_executor", "resume")
+async def _exec_resume(arguments):
+    await get_orchestration().execution_agent.resume_execution()
+    return _RESUMED
+
+@handler("parallel_executor", "cancel", required=("task_id",))
+async def _exec_cancel(arguments):
+    await get_orchestration().execution_agent.cancel_task(arguments["task_id"])
+    return _text({"success": True, "task_id": arguments["task_id"]})
+
+
+# Progress Tracker
+@handler("progress_tracker", "get", required=("task_id",))
+async def _progress_get(arguments):
+    progress = get_memory().progress_tracker.get_current_progress(arguments["task_id"])
+    return _text(progress or {"task_id": arguments["task_id"], "progress": 0})
+
+@handler("progress_tracker", "history", required=("task_id",))
+async def _progress_history(arguments):
+    history = get_memory().progress_tracker.get_history(arguments["task_id"], arguments.get("limit", 100))
+    return _text({"history": history, "count": len(history)})
+
+@handler("progress_tracker", "summary", required=("session_id",))
+async def _progress_summary(arguments):
+    summary = get_memory().progress_tracker.get_progress_summary(
+        arguments["session_id"], arguments.get("root_task_id")
+    )
+    return _text(summary)
+
+@handler("progress_tracker", "predict", required=("session_id", "root_task_id"))
+async def _progress_predict(arguments):
+    prediction = get_memory().progress_tracker.predict_completion(
+        arguments["session_id"], arguments["root_task_id"]
+    )
+    return _text(prediction)
+
+
+# Task Decomposer
+@handler("task_decomposer", "decompose", required=("session_id", "task_id"))
+async def _decomp_decompose(arguments):
+    subtask_ids = await get_orchestration().decomposition_agent.decompose_task(
+        arguments["session_id"],
+        arguments["task_id"],
+        arguments.get("auto_dependencies", True)
+    )
+    return _text({"subtasks": subtask_ids, "count": len(subtask_ids)})
+
+@handler("task_decomposer", "analyze_complexity", required=("task_id",))
+async def _decomp_complexity(arguments):
+    task = get_task(arguments["task_id"])
+    if not task:
+        return _TASK_NOT_FOUND
+    complexity = get_orchestration().decomposition_agent.analyze_complexity(task)
+    return _text({"complexity": complexity})
+
+@handler("task_decomposer", "classify", required=("task_id",))
+async def _decomp_classify(arguments):
+    task = get_task(arguments["task_id"])
+    if not task:
+        return _TASK_NOT_FOUND
+    task_type = get_orchestration().decomposition_agent.classify_task(task)
+    return _text({"task_type": task_type})
+
+@handler("task_decomposer", "analyze_and_classify", required=("task_id",))
+async def _decomp_analyze_and_classify(arguments):
+    # One task read serves both analyses
+    task = get_task(arguments["task_id"])
+    if not task:
+        return _TASK_NOT_FOUND
+    decomp = get_orchestration().decomposition_agent
+    return _text({
+        "complexity": decomp.analyze_complexity(task),
+        "task_type": decomp.classify_task(task)
+    })
+
+# Subtask templates are a class constant - encode the response once
+_TEMPLATES = _text({"templates": TaskDecompositionAgent.SUBTASK_TEMPLATES})
+
+@handler("task_decomposer", "get_templates")
+async def _decomp_templates(arguments):
+    return _TEMPLATES
+
+
+# Design Planner (Refactored)
+@handler("design_planner", "create_hld", "create_lld", "generate", "get_design",
+         required=("session_id", "task_id"))
+async def _design(arguments):
+    mem = get_memory()
+    action = arguments["action"]
+    session_id = arguments["session_id"]
+    task_id = arguments["task_id"]
+    
+    task = get_task(task_id)
+    if not task:
+        return _TASK_NOT_FOUND
+    
+    if action == "get_design":
+        metadata = _loads(task.get('metadata', '{}') or '{}')
+        hld = metadata.get('hld')
+        lld = metadata.get('lld')
+        return _text({
+            "has_hld": hld is not None,
+            "has_lld": lld is not None,
+            "hld": hld,
+            "lld": lld
+        })
+    
+    # Get configuration
+    detail_level = arguments.get("detail_level", "medium")
+    include_diagrams = arguments.get("include_diagrams", True)
+    
+    from memory_store_v2.agents.design_planner_agent import DesignPlannerAgent
+    agent = DesignPlannerAgent(mem.tasks)
+    if action == "create_hld":
+        result = await agent.create_hld(session_id, task_id, detail_level, include_diagrams)
+    elif action == "create_lld":
+        result = await agent.create_lld(session_id, task_id, detail_level, include_diagrams)
+    else:
+        result = await agent.generate_complete_design(session_id, task_id, detail_level, include_diagrams)
+    return _text(result)
+
+
+# Memory Operations
+@handler("memory_ops", "store_long", required=("session_id", "memory_type", "content"),
+         session_lock=True, io_bound=True)
+def _memory_store_long(arguments):
+    memory_id = get_memory().memory.store_long_term(
+        arguments["session_id"],
+        arguments["memory_type"],
+        arguments["content"],
+        arguments.get("tags"),
+        arguments.get("confidence", 1.0)
+    )
+    return _text({"memory_id": memory_id, "status": "stored"})
+
+@handler("memory_ops", "retrieve_long", required=("session_id",))
+async def _memory_retrieve_long(arguments):
+    params = (
+        arguments["session_id"],
+        arguments.get("query"),
+        arguments.get("memory_type"),
+        arguments.get("limit", 10)
+    )
+    
+    async def produce():
+        body = await _read(get_memory().memory.iter_long_term_json, *params)
+        return [TextContent(type="text", text=body)]
+    
+    return await _cached_read(("retrieve_long", params, get_memory().memory.version), produce)
+
+class _PushBuffer:
+    """
+    Groups push_context / push_action writes into shared transactions.
+    
+    Pushes arriving within the window are written together by a background
+    flusher in one transaction. Each push is acknowledged only once its
+    batch has committed, and a failed batch is raised to every caller in it.
+    Anything reading or replacing short-term memory calls flush() first so
+    it sees every pending push.
+    """
+    
+    def __init__(self, window: float = 0.01, max_pending: int = 10000):
+        self.window = window
+        self.max_pending = max_pending
+        self._pending: List[Tuple[str, str, Dict[str, Any]]] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+    
+    def put(self, kind: str, session_id: str, payload: Dict[str, Any]) -> asyncio.Future:
+        """Queue a push; the returned future resolves once it is committed."""
+        written = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, session_id, payload))
+        self._waiters.append(written)
+        self._start()
+        if len(self._pending) >= self.max_pending:
+            # Full - write the backlog now instead of waiting out the window
+            self._wake.set()
+        return written
+    
+    async def flush(self):
+        """Write every buffered push before returning."""
+        while self._pending or (self._flusher is not None and not self._flusher.done()):
+            self._start()
+            self._wake.set()
+            await asyncio.shield(self._flusher)
+    
+    def _start(self):
+        if self._flusher is None or self._flusher.done():
+            # A fresh event per flusher - it binds to the running loop on first wait
+            self._wake = asyncio.Event()
+            self._flusher = asyncio.create_task(self._drain(self._wake))
+    
+    async def _drain(self, wake: asyncio.Event):
+        try:
+            await asyncio.wait_for(wake.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
         
-        # Checkpoint Operations
-        elif name == "checkpoint_ops":
-            action = arguments["action"]
-            
-            if action == "create":
-                error = await validate_input(action, arguments, ["level", "session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                
-                level = arguments["level"]
-                session_id = arguments["session_id"]
-                
-                if level == "overall":
-                    cp_id = mem.checkpoints.create_overall(
-                        session_id,
-                        arguments.get("tags"),
-                        arguments.get("metadata")
-                    )
-                elif level == "subtask":
-                    if not arguments.get("task_id"):
-                        return [TextContent(type="text", text=json.dumps({"error": "task_id required for subtask checkpoint"}))]
-                    cp_id = mem.checkpoints.create_subtask(
-                        arguments["task_id"],
-                        arguments.get("tags"),
-                        arguments.get("metadata")
-                    )
-                elif level == "stage":
-                    if not arguments.get("task_id") or not arguments.get("stage_name"):
-                        return [TextContent(type="text", text=json.dumps({"error": "task_id and stage_name required for stage checkpoint"}))]
-                    cp_id = mem.checkpoints.create_stage(
-                        arguments["task_id"],
-                        arguments["stage_name"],
-                        arguments.get("tags"),
-                        arguments.get("metadata")
-                    )
+        while self._pending:
+            batch, self._pending = self._pending, []
+            waiters, self._waiters = self._waiters, []
+            try:
+                await _offload(get_memory().memory.push_many, batch)
+            except Exception as e:
+                # Each caller's _dispatch reports and logs the failure
+                for written in waiters:
+                    if not written.done():
+                        written.set_exception(e)
+            else:
+                for written in waiters:
+                    if not written.done():
+                        written.set_result(None)
+
+
+_PUSHES = _PushBuffer()
+
+@handler("memory_ops", "store_short", required=("session_id",), session_lock=True)
+async def _memory_store_short(arguments):
+    await _PUSHES.flush()
+    await _offload(
+        get_memory().memory.store_short_term,
+        arguments["session_id"],
+        arguments.get("active_context"),
+        arguments.get("recent_actions"),
+        arguments.get("focus_area"),
+        arguments.get("temporary_state")
+    )
+    return _STORED_SHORT
+
+@handler("memory_ops", "get_short", required=("session_id",))
+async def _memory_get_short(arguments):
+    await _PUSHES.flush()
+    session_id = arguments["session_id"]
+    
+    async def produce():
+        result = get_memory().memory.get_short_term(session_id)
+        return _text(result or {})
+    
+    return await _cached_read(("get_short", session_id, get_memory().memory.version), produce)
+
+async def _push(kind: str, session_id: str, payload: Dict[str, Any]) -> List[TextContent]:
+    """Buffer one push and acknowledge it once its batch has committed."""
+    # Queue under the session lock so a push never slips into the flush of a
+    # store_short / clear_short that is replacing this session's memory
+    async with _session_lock(session_id):
+        written = _PUSHES.put(kind, session_id, payload)
+    await written
+    return _OK
+
+@handler("memory_ops", "push_context", required=("session_id",))
+async def _memory_push_context(arguments):
+    return await _push("context", arguments["session_id"], arguments.get("content", {}))
+
+class _PushActionArgs:
+    """Parsed arguments for the hot memory_ops/push_action action."""
+    __slots__ = ("session_id", "action_data")
+    
+    def __init__(self, arguments: Dict[str, Any]):
+        self.session_id = arguments["session_id"]
+        self.action_data = arguments.get("action_data", {})
+
+@handler("memory_ops", "push_action", required=("session_id",))
+async def _memory_push_action(arguments):
+    args = _PushActionArgs(arguments)
+    return await _push("action", args.session_id, args.action_data)
+
+@handler("memory_ops", "clear_short", required=("session_id",), session_lock=True)
+async def _memory_clear_short(arguments):
+    await _PUSHES.flush()
+    await _offload(get_memory().memory.clear_short_term, arguments["session_id"])
+    return _OK
+
+
+# Checkpoint Operations
+class _CheckpointBatcher:
+    """
+    Coalesces concurrent checkpoint creates into worker-thread batches.
+    
+    Creates submitted within the batch window run together off the event loop
+    and share a single snapshot directory fsync; each caller gets its own result.
+    """
+    
+    def __init__(self, window: float = 0.002):
+        self.window = window
+        self._pending: List[Tuple[Callable, tuple, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+    
+    async def submit(self, fn: Callable, *args) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((fn, args, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._drain())
+        return await future
+    
+    async def _drain(self):
+        await asyncio.sleep(self.window)
+        while self._pending:
+            batch, self._pending = self._pending, []
+            results = await _offload(self._run_batch, batch)
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
                 else:
-                    return [TextContent(type="text", text=json.dumps({"error": f"Unknown level: {level}"}))]
-                
-                return [TextContent(type="text", text=json.dumps({"checkpoint_id": cp_id, "level": level}))]
-            
-            elif action == "list":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                checkpoints = mem.checkpoints.list(
-                    arguments["session_id"],
-                    arguments.get("task_id"),
-                    arguments.get("level"),
-                    arguments.get("tags"),
-                    arguments.get("limit", 50)
-                )
-                return [TextContent(type="text", text=json.dumps({"checkpoints": checkpoints, "count": len(checkpoints)}))]
-            
-            elif action == "get":
-                error = await validate_input(action, arguments, ["checkpoint_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                checkpoint = mem.checkpoints.get(arguments["checkpoint_id"])
-                if not checkpoint:
-                    return [TextContent(type="text", text=json.dumps({"error": "Checkpoint not found"}))]
-                return [TextContent(type="text", text=json.dumps(checkpoint))]
-            
-            elif action == "restore":
-                error = await validate_input(action, arguments, ["session_id", "checkpoint_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                level = arguments.get("level", "overall")
-                success = mem.checkpoints.restore(arguments["session_id"], arguments["checkpoint_id"], level)
-                return [TextContent(type="text", text=json.dumps({"success": success, "restored": success}))]
-            
-            elif action == "diff":
-                error = await validate_input(action, arguments, ["checkpoint_id", "checkpoint_id_2"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                diff = mem.checkpoints.diff(arguments["checkpoint_id"], arguments["checkpoint_id_2"])
-                return [TextContent(type="text", text=json.dumps(diff))]
-            
-            elif action == "cleanup":
-                error = await validate_input(action, arguments, ["session_id"])
-                if error:
-                    return [TextContent(type="text", text=json.dumps({"error": error}))]
-                deleted = mem.checkpoints.cleanup_old(arguments["session_id"], arguments.get("keep_last", 10))
-                return [TextContent(type="text", text=json.dumps({"deleted": deleted, "remaining": arguments.get("keep_last", 10)}))]
-        
-        # System Stats
-        elif name == "system_stats":
-            stats = mem.get_stats()
-            include_health = arguments.get("include_health", True)
-            include_storage = arguments.get("include_storage", True)
-            
-            if include_health:
-                stats["health"] = {
-                    "status": "healthy",
-                    "memory_initialized": memory is not None,
-                    "orchestration_initialized": orchestration is not None
-                }
-            
-            if include_storage:
-                import os
-                base_dir = os.environ.get("MEMORY_STORE_DIR", "./memory_store_v2")
-                db_path = os.path.join(base_dir, "memory.db")
-                if os.path.exists(db_path):
-                    stats["storage"] = {
-                        "db_size_bytes": os.path.getsize(db_path),
-                        "snapshots_count": len([f for f in os.listdir(f"{base_dir}/snapshots") if f.endswith('.json')] if os.path.exists(f"{base_dir}/snapshots") else [])
-                    }
-            
-            return [TextContent(type="text", text=json.dumps(stats, indent=2))]
+                    future.set_exception(value)
+    
+    @staticmethod
+    def _run_batch(batch) -> List[Tuple[bool, Any]]:
+        results = []
+        for fn, args, _ in batch:
+            try:
+                results.append((True, fn(*args)))
+            except Exception as e:
+                results.append((False, e))
         
-        # Unknown tool
-        return [TextContent(type="text", text=json.dumps({"error": f"Unknown tool: {name}"}))]
+        try:
+            get_memory().file_store.sync()
+        except OSError as e:
+            logger.warning(f"Snapshot directory sync failed: {e}")
+        return results
+
+
+_CHECKPOINTS = _CheckpointBatcher()
+
+# Checkpoints being written in the background, keyed by their pre-allocated ID
+_PENDING_CHECKPOINTS: Dict[str, asyncio.Task] = {}
+_MAX_PENDING_CHECKPOINTS = 100
+
+async def _checkpoint_settled(checkpoint_id: str):
+    """Wait for a background create of this checkpoint, if one is in flight."""
+    task = _PENDING_CHECKPOINTS.get(checkpoint_id)
+    if task is not None and not task.done():
+        await asyncio.wait({task})
+
+def _log_checkpoint_failure(task: asyncio.Task):
+    """Surface background create failures even if nobody awaits them."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background checkpoint failed: {task.exception()}")
+
+@handler("checkpoint_ops", "create", required=("level", "session_id"))
+async def _checkpoint_create(arguments):
+    # Snapshots include short-term memory
+    await _PUSHES.flush()
+    mem = get_memory()
+    level = arguments["level"]
+    tags = arguments.get("tags")
+    metadata = arguments.get("metadata")
+    
+    if level == "overall":
+        call = (mem.checkpoints.create_overall, arguments["session_id"], tags, metadata)
+    elif level == "subtask":
+        if not arguments.get("task_id"):
+            return _text({"error": "task_id required for subtask checkpoint"})
+        call = (mem.checkpoints.create_subtask, arguments["task_id"], tags, metadata)
+    elif level == "stage":
+        if not arguments.get("task_id") or not arguments.get("stage_name"):
+            return _text({"error": "task_id and stage_name required for stage checkpoint"})
+        call = (mem.checkpoints.create_stage, arguments["task_id"], arguments["stage_name"], tags, metadata)
+    else:
+        return _text({"error": f"Unknown level: {level}"})
+    
+    if not arguments.get("background"):
+        cp_id = await _CHECKPOINTS.submit(*call)
+        return _text({"checkpoint_id": cp_id, "level": level})
+    
+    # Forget the oldest finished creates once the registry is full
+    if len(_PENDING_CHECKPOINTS) >= _MAX_PENDING_CHECKPOINTS:
+        finished = [c for c, t in _PENDING_CHECKPOINTS.items() if t.done()]
+        for cp_id in finished[:len(_PENDING_CHECKPOINTS) - _MAX_PENDING_CHECKPOINTS + 1]:
+            del _PENDING_CHECKPOINTS[cp_id]
+    
+    cp_id = f"cp_{uuid.uuid4().hex[:8]}"
+    task = _PENDING_CHECKPOINTS[cp_id] = asyncio.create_task(_CHECKPOINTS.submit(*call, cp_id))
+    task.add_done_callback(_log_checkpoint_failure)
+    return _text({"checkpoint_id": cp_id, "level": level, "status": "pending"})
+
+@handler("checkpoint_ops", "await", required=("checkpoint_id",))
+async def _checkpoint_await(arguments):
+    checkpoint_id = arguments["checkpoint_id"]
+    task = _PENDING_CHECKPOINTS.pop(checkpoint_id, None)
+    if task is None:
+        if get_memory().checkpoints.get(checkpoint_id) is None:
+            return _CHECKPOINT_NOT_FOUND
+        return _text({"checkpoint_id": checkpoint_id, "status": "completed"})
+    
+    await asyncio.wait({task})
+    if task.cancelled() or task.exception() is not None:
+        error = "cancelled" if task.cancelled() else str(task.exception())
+        return _text({"checkpoint_id": checkpoint_id, "status": "failed", "error": error})
+    return _text({"checkpoint_id": checkpoint_id, "status": "completed"})
+
+@handler("checkpoint_ops", "list", required=("session_id",))
+async def _checkpoint_list(arguments):
+    tags = arguments.get("tags")
+    params = (
+        arguments["session_id"],
+        arguments.get("task_id"),
+        arguments.get("level"),
+        tuple(tags) if tags else None,
+        arguments.get("limit", 50)
+    )
+    
+    async def produce():
+        body = await _read(get_memory().checkpoints.iter_list_json, *params)
+        return [TextContent(type="text", text=body)]
+    
+    return await _cached_read(("checkpoint_list", params, get_memory().checkpoints.version), produce)
+
+@handler("checkpoint_ops", "get", required=("checkpoint_id",))
+async def _checkpoint_get(arguments):
+    await _checkpoint_settled(arguments["checkpoint_id"])
+    checkpoint = get_memory().checkpoints.get(arguments["checkpoint_id"])
+    if not checkpoint:
+        return _CHECKPOINT_NOT_FOUND
+    return _text(checkpoint)
+
+@handler("checkpoint_ops", "restore", required=("session_id", "checkpoint_id"))
+async def _checkpoint_restore(arguments):
+    # Pending pushes must not land on top of the restored state
+    await _PUSHES.flush()
+    await _checkpoint_settled(arguments["checkpoint_id"])
+    level = arguments.get("level", "overall")
+    success = await _offload(get_memory().checkpoints.restore,
+                             arguments["session_id"], arguments["checkpoint_id"], level)
+    return _text({"success": success, "restored": success})
+
+# Diff responses by checkpoint pair - checkpoints never change once written,
+# so entries only go stale when cleanup deletes checkpoints
+_DIFFS: "OrderedDict[Tuple[str, str], List[TextContent]]" = OrderedDict()
+_MAX_DIFFS = 512
+
+@handler("checkpoint_ops", "diff", required=("checkpoint_id", "checkpoint_id_2"))
+async def _checkpoint_diff(arguments):
+    key = (arguments["checkpoint_id"], arguments["checkpoint_id_2"])
+    response = _DIFFS.get(key)
+    if response is not None:
+        _DIFFS.move_to_end(key)
+        return response
+    
+    await _checkpoint_settled(key[0])
+    await _checkpoint_settled(key[1])
+    diff = get_memory().checkpoints.diff(*key)
+    response = _text(diff)
+    if "error" not in diff:
+        _DIFFS[key] = response
+        if len(_DIFFS) > _MAX_DIFFS:
+            _DIFFS.popitem(last=False)
+    return response
+
+@handler("checkpoint_ops", "cleanup", required=("session_id",))
+async def _checkpoint_cleanup(arguments):
+    _DIFFS.clear()
+    deleted = await _offload(get_memory().checkpoints.cleanup_old, arguments["session_id"], arguments.get("keep_last", 10))
+    return _text({"deleted": deleted, "remaining": arguments.get("keep_last", 10)})
+
+
+# System Stats
+# Responses keyed by the include flags, reused for a short TTL to absorb polling
+_STATS_TTL = 0.5
+_STATS_CACHE: Dict[Tuple[bool, bool], Tuple[float, List[TextContent]]] = {}
+
+@handler("system_stats", "")
+async def _system_stats(arguments):
+    include_health = arguments.get("include_health", True)
+    include_storage = arguments.get("include_storage", True)
+    
+    key = (bool(include_health), bool(include_storage))
+    now = time.monotonic()
+    cached = _STATS_CACHE.get(key)
+    if cached and now - cached[0] < _STATS_TTL:
+        return cached[1]
+    
+    stats = await _read(get_memory().get_stats)
+    
+    if include_health:
+        stats["health"] = {
+            "status": "healthy",
+            "memory_initialized": memory is not None,
+            "orchestration_initialized": orchestration is not None,
+            "memory_cache": get_cache_stats()
+        }
+    
+    if include_storage:
+        base_dir = os.environ.get("MEMORY_STORE_DIR", "./memory_store_v2")
+        db_path = os.path.join(base_dir, "memory.db")
+        if os.path.exists(db_path):
+            stats["storage"] = {
+                "db_size_bytes": os.path.getsize(db_path),
+                "snapshots_count": len([f for f in os.listdir(f"{base_dir}/snapshots") if f.endswith('.json')] if os.path.exists(f"{base_dir}/snapshots") else [])
+            }
+    
+    response = _text(stats)
+    _STATS_CACHE[key] = (now, response)
+    return response
+
+
+async def _bulk(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+    """Run a tool's subcalls concurrently and return their results as one JSON array."""
+    subcalls = arguments.get("subcalls")
+    if not isinstance(subcalls, list):
+        return _text({"error": "Missing required arguments for action 'bulk': subcalls"})
+    if any(isinstance(sub, dict) and sub.get("action") == "bulk" for sub in subcalls):
+        return _text({"error": "Nested bulk subcalls are not supported"})
+    
+    results = await asyncio.gather(*[_dispatch_checked(name, sub) for sub in subcalls])
+    # Each subcall is already encoded - splice the texts instead of re-encoding
+    return [TextContent(type="text", text="[" + ",".join(r[0].text for r in results) + "]")]
+
+
+for _tool, _actions in HANDLERS.items():
+    if "" not in _actions:
+        _actions["bulk"] = functools.partial(_bulk, _tool)
+
+
+async def _dispatch(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+    """Route one call to its handler, turning failures into error responses."""
+    try:
+        if not isinstance(arguments, dict):
+            raise ValueError("Arguments must be an object")
+        actions = HANDLERS.get(name)
+        if actions is None:
+            return [TextContent(type="text", text=_ERR_UNKNOWN % _dumps(f"Unknown tool: {name}"))]
+        handler_fn = actions.get(arguments.get("action", ""))
+        if handler_fn is None:
+            return [TextContent(type="text", text=_ERR_UNKNOWN % _dumps(
+                f"Unknown action '{arguments.get('action')}' for tool: {name}"
+            ))]
+        return await handler_fn(arguments)
     
     except ValueError as e:
         logger.warning(f"Validation error in {name}: {e}")
-        return [TextContent(type="text", text=json.dumps({"error": str(e), "type": "validation"}))]
+        return [TextContent(type="text", text=_ERR_VALIDATION % _dumps(str(e)))]
     
     except Exception as e:
         logger.error(f"Error in {name}: {e}", exc_info=True)
-        return [TextContent(type="text", text=json.dumps({
-            "error": str(e),
-            "type": "internal",
-            "tool": name,
-            "action": arguments.get("action") if isinstance(arguments, dict) else None
-        }))]
+        action = arguments.get("action") if isinstance(arguments, dict) else None
+        return [TextContent(type="text", text=_ERR_INTERNAL % (
+            _dumps(str(e)), _dumps(name), _dumps(action)
+        ))]
+
+
+async def _dispatch_checked(name: str, arguments: Any) -> List[TextContent]:
+    """Validate a nested call against its tool's schema, then route it like _dispatch."""
+    error = _schema_error(name, arguments)
+    if error is not None:
+        return [TextContent(type="text", text=_ERR_VALIDATION % _dumps(error))]
+    return await _dispatch(name, arguments)
+
+
+# Batch Operations
+def _batch_arguments(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Call arguments for one batch item."""
+    arguments = dict(item.get("args") or {})
+    if "action" in item:
+        arguments["action"] = item["action"]
+    return arguments
+
+@handler("batch_ops", "", required=("items",))
+async def _batch_ops(arguments):
+    items = arguments["items"]
+    index_of: Dict[str, int] = {}
+    for index, item in enumerate(items):
+        item_id = item.get("id", str(index))
+        if item_id in index_of:
+            raise ValueError(f"Duplicate batch item id: {item_id}")
+        if item.get("name") == "batch_ops":
+            raise ValueError("Nested batch_ops items are not supported")
+        index_of[item_id] = index
+    
+    sorter = TopologicalSorter()
+    for item_id, index in index_of.items():
+        depends_on = items[index].get("depends_on") or []
+        missing = [d for d in depends_on if d not in index_of]
+        if missing:
+            raise ValueError(f"Unknown depends_on for batch item {item_id}: {', '.join(missing)}")
+        sorter.add(item_id, *depends_on)
+    try:
+        sorter.prepare()
+    except CycleError as e:
+        raise ValueError(f"Batch items form a dependency cycle: {' -> '.join(e.args[1])}")
+    
+    # Run each layer of ready items concurrently; invalid arguments and failures
+    # come back as that item's error payload, so one bad item never aborts its siblings
+    texts: List[Optional[str]] = [None] * len(items)
+    while sorter.is_active():
+        layer = sorter.get_ready()
+        results = await asyncio.gather(*[
+            _dispatch_checked(items[index_of[item_id]]["name"], _batch_arguments(items[index_of[item_id]]))
+            for item_id in layer
+        ])
+        for item_id, result in zip(layer, results):
+            texts[index_of[item_id]] = result[0].text
+        sorter.done(*layer)
+    
+    return [TextContent(type="text", text="[" + ",".join(texts) + "]")]
+
+
+@app.call_tool(validate_input=False)
+async def call_tool(name: str, arguments: Dict[str, Any]):
+    """Handle tool calls with proper error handling and validation."""
+    # Reject oversized payloads before schema validation or any storage work
+    size = _encoded_size(arguments)
+    if size > _MAX_ARG_BYTES:
+        return [TextContent(type="text", text=_ERR_VALIDATION % _dumps(
+            f"Arguments too large: {size} bytes (limit {_MAX_ARG_BYTES})"
+        ))]
+    error = _schema_error(name, arguments)
+    if error is not None:
+        return CallToolResult(content=[TextContent(type="text", text=error)], isError=True)
+    get_memory()
+    get_orchestration()
+    return await _dispatch(name, arguments)
+
+
+# Buffer size for the stdio transport - large responses go out in few writes
+_STDIO_BUFFER = 1 << 16
+
+
+def _stdio_streams():
+    """UTF-8 stdin/stdout for the MCP transport with 64 KB buffers instead of the 8 KB default."""
+    stdin = open(sys.stdin.fileno(), "rb", buffering=_STDIO_BUFFER, closefd=False)
+    stdout = open(sys.stdout.fileno(), "wb", buffering=_STDIO_BUFFER, closefd=False)
+    return (
+        anyio.wrap_file(TextIOWrapper(stdin, encoding="utf-8", errors="replace")),
+        anyio.wrap_file(TextIOWrapper(stdout, encoding="utf-8")),
+    )
+
 
 async def main():
     """Main entry point with graceful shutdown handling."""
@@ -970,14 +1608,16 @@ async def main():
     # Initialize memory system
     init_memory_system()
     
-    logger.info("=" * 60)
-    logger.info("ChainOfThought Coder v2 - MCP Server")
-    logger.info(f"Storage: {memory.db.db_path if memory else 'N/A'}")
-    logger.info("Ready to accept connections...")
-    logger.info("=" * 60)
+    # stdout is the protocol channel - diagnostics go to stderr, and only on request
+    if os.environ.get("COT_DEBUG"):
+        logger.info("=" * 60)
+        logger.info("ChainOfThought Coder v2 - MCP Server")
+        logger.info(f"Storage: {memory.db.db_path if memory else 'N/A'}")
+        logger.info("Ready to accept connections...")
+        logger.info("=" * 60)
     
     try:
-        async with stdio_server() as (read_stream, write_stream):
+        async with stdio_server(*_stdio_streams()) as (read_stream, write_stream):
             await app.run(read_stream, write_stream, app.create_initialization_options())
     except asyncio.CancelledError:
         logger.info("Server shutdown requested...")
@@ -986,11 +1626,17 @@ async def main():
     finally:
         # Cleanup
         if memory:
+            await _PUSHES.flush()
             logger.info("Closing memory system...")
+            with _SYSTEM_CACHE_LOCK:
+                _SYSTEM_CACHE.pop(_storage_key(), None)
             memory.close()
             memory = None
             orchestration = None
         logger.info("Shutdown complete.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if HAS_UVLOOP:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -40,7 +40,7 @@ async def test_bug_fixes():
     """
     print_section("Bug Fix Verification Tests")
     
-    memory = MemorySystemV2()
+    memory = MemorySystemV2(fast_unsafe=True)
     orchestration = OrchestrationEngine(memory.tasks, max_parallel=2)
     
     # BUG 1: Verify 'general' template exists (was missing)
@@ -125,7 +125,7 @@ async def test_core_components():
     print_section("Enhanced MCP Component Tests")
     
     # Initialize system
-    memory = MemorySystemV2()
+    memory = MemorySystemV2(fast_unsafe=True)
     orchestration = OrchestrationEngine(memory.tasks, max_parallel=2)
     
     # Test 1: Session Management
@@ -147,13 +147,15 @@ async def test_core_components():
     subtask_ids = await orchestration.decomposition_agent.decompose_task(session_id, task_id)
     print(f"   [OK] Decomposed into {len(subtask_ids)} subtasks:")
     
-    for i, sub_id in enumerate(subtask_ids[:5], 1):
-        sub = memory.tasks.get(sub_id)
-        task_type = orchestration.decomposition_agent.classify_task(sub)
-        name = sub['name'][:40] + "..." if len(sub['name']) > 40 else sub['name']
-        print(f"      {i}. {name} ({task_type})")
+    fetched = memory.tasks.get_many(subtask_ids[:5])
+    subs = [fetched[sub_id] for sub_id in subtask_ids[:5]]
+    # The precision spec truncates long names while formatting
+    fmt = "      {idx}. {name:.40s} ({t})".format
+    classify = orchestration.decomposition_agent.classify_task
+    lines = [fmt(idx=i, name=sub['name'], t=classify(sub)) for i, sub in enumerate(subs, 1)]
     if len(subtask_ids) > 5:
-        print(f"      ... and {len(subtask_ids) - 5} more")
+        lines.append(f"      ... and {len(subtask_ids) - 5} more")
+    print(*lines, sep="\n")
     
     # Test 4: Task Classification
     print_subsection("4. Task Classification")
@@ -165,8 +167,12 @@ async def test_core_components():
         ("Documentation", "Create API documentation")
     ]
     
-    for name, desc in test_tasks:
-        test_task_id = memory.tasks.create_main_task(session_id, name, desc)
+    # Independent creations run concurrently
+    test_task_ids = await asyncio.gather(*[
+        asyncio.to_thread(memory.tasks.create_main_task, session_id, name, desc)
+        for name, desc in test_tasks
+    ])
+    for (name, desc), test_task_id in zip(test_tasks, test_task_ids):
         test_task = memory.tasks.get(test_task_id)
         task_type = orchestration.decomposition_agent.classify_task(test_task)
         complexity = orchestration.decomposition_agent.analyze_complexity(test_task)
@@ -249,7 +255,7 @@ async def test_edge_cases():
     """Test edge cases and error handling."""
     print_section("Edge Case Tests")
     
-    memory = MemorySystemV2()
+    memory = MemorySystemV2(fast_unsafe=True)
     orchestration = OrchestrationEngine(memory.tasks, max_parallel=2)
     
     # Test empty session
@@ -284,7 +290,30 @@ async def test_edge_cases():
         test_task = memory.tasks.get(test_id)
         task_type = orchestration.decomposition_agent.classify_task(test_task)
         print(f"   [OK] '{case}': {task_type}")
-    
+
+    # Test work stealing respects dependencies and drains cycles
+    print_subsection("Work Stealing Execution")
+    agent = ParallelExecutionAgent(memory.tasks, max_parallel=2, work_stealing=True)
+    first = memory.tasks.create_main_task(session_id, "First")
+    second = memory.tasks.create_main_task(session_id, "Second")
+    third = memory.tasks.create_main_task(session_id, "Third")
+    memory.tasks.add_dependency(second, first)
+    memory.tasks.add_dependency(third, second)
+    memory.tasks.add_dependency(second, third)
+    started = []
+
+    async def record(task_id):
+        started.append(task_id)
+        await asyncio.sleep(0)
+        return task_id
+
+    agent.set_task_executor(record)
+    agent.build_task_queue([third, second, first])
+    result = await agent.process_queue()
+    assert result['executed'] == 3, "All tasks should run"
+    assert started[0] == first, "Only the task without dependencies starts first"
+    print(f"   [OK] Executed {result['executed']} tasks, first: {started[0] == first}")
+
     memory.close()
     print_section("Edge Case Tests Passed!")
 
@@ -3,24 +3,56 @@ Comprehensive test suite for Memory System V2.
 Tests all managers and integration scenarios.
 """
 import pytest
-import tempfile
-import shutil
 import json
+import threading
 from memory_store_v2 import MemorySystemV2
+from memory_store_v2.core.file_store import MemoryFileStore
+from memory_store_v2.managers.session_manager import SessionManager
+from memory_store_v2.managers.task_manager import TaskManager
+from memory_store_v2.managers.memory_manager import MemoryManager
+from memory_store_v2.managers.checkpoint_manager import CheckpointManager
+from memory_store_v2.managers.progress_tracker import ProgressTracker
+
+
+@pytest.fixture(scope="module")
+def store():
+    """One in-memory system shared by every test in the module."""
+    memory = MemorySystemV2(":memory:")
+    yield memory
+    memory.close()
+
+
+@pytest.fixture
+def memory(store):
+    """The shared system, with each test's writes rolled back afterwards."""
+    # Snapshots, checkpoint caches and version counters live outside SQLite,
+    # so each test also gets a fresh file store and managers over the database
+    store.file_store = MemoryFileStore()
+    store.sessions = SessionManager(store.db)
+    store.tasks = TaskManager(store.db)
+    store.memory = MemoryManager(store.db)
+    store.checkpoints = CheckpointManager(store.db, store.file_store, store.tasks, store.memory)
+    store.progress_tracker = ProgressTracker(store.tasks)
+    
+    store.db.execute("SAVEPOINT test")
+    yield store
+    store.db.execute("ROLLBACK TO test")
+    store.db.execute("RELEASE test")
+
+
+@pytest.fixture
+def session_id(memory):
+    """A fresh session for tests that only need somewhere to put their data."""
+    return memory.sessions.create("Test Session")
 
 
 class TestMemorySystemV2:
     """Test suite for the new hybrid memory system."""
     
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup_memory(self, memory):
         """Set up test environment."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.memory = MemorySystemV2(self.temp_dir)
-    
-    def teardown_method(self):
-        """Clean up test environment."""
-        self.memory.close()
-        shutil.rmtree(self.temp_dir)
+        self.memory = memory
     
     def test_session_lifecycle(self):
         """Test session creation, retrieval, and lifecycle."""
@@ -32,14 +64,16 @@ class TestMemorySystemV2:
         session = self.memory.sessions.get(session_id)
         assert session['name'] == "Test Session"
         assert session['status'] == "active"
-        assert json.loads(session['metadata'])['project'] == "test"
+        assert session['metadata']['project'] == "test"
         
         # List sessions
         sessions = self.memory.sessions.list()
         assert len(sessions) == 1
         
         # Update session
+        version = self.memory.sessions.version
         self.memory.sessions.update(session_id, status="paused")
+        assert self.memory.sessions.version > version
         session = self.memory.sessions.get(session_id)
         assert session['status'] == "paused"
         
@@ -48,10 +82,8 @@ class TestMemorySystemV2:
         session = self.memory.sessions.get(session_id)
         assert session['status'] == "archived"
     
-    def test_hierarchical_tasks(self):
+    def test_hierarchical_tasks(self, session_id):
         """Test task hierarchy with automatic progress aggregation."""
-        session_id = self.memory.sessions.create("Task Test")
-        
         # Create main task
         main_id = self.memory.tasks.create_main_task(
             session_id, "Build App", "Full stack application"
@@ -86,11 +118,26 @@ class TestMemorySystemV2:
         assert main_task['subtasks'][0]['progress'] == 1.0
         assert main_task['subtasks'][1]['progress'] == 0.5
         assert main_task['subtasks'][2]['progress'] == 0.0
+        
+        # Depth layers come from the same single tree query
+        layers = self.memory.tasks.get_layers(session_id, main_id)
+        assert layers['layers'] == [[main_id], [sub1, sub2, sub3]]
+        assert layers['nodes'][sub2]['progress'] == 0.5
+        
+        # Batched lookup skips unknown IDs
+        fetched = self.memory.tasks.get_many([sub3, sub1, "missing"])
+        assert set(fetched) == {sub1, sub3}
+        assert fetched[sub1]['status'] == "completed"
+        
+        # Writes bump the task store version, reads do not
+        version = self.memory.tasks.version
+        self.memory.tasks.get_tree(session_id)
+        assert self.memory.tasks.version == version
+        self.memory.tasks.add_dependency(sub2, sub1)
+        assert self.memory.tasks.version > version
     
-    def test_long_term_memory(self):
+    def test_long_term_memory(self, session_id):
         """Test long-term memory storage and retrieval."""
-        session_id = self.memory.sessions.create("Memory Test")
-        
         # Store knowledge
         mem_id1 = self.memory.memory.store_long_term(
             session_id, "knowledge",
@@ -132,11 +179,13 @@ class TestMemorySystemV2:
             session_id, query="performance"
         )
         assert len(results) == 1
+        
+        # Pre-serialized retrieval matches dumping the parsed results
+        body = self.memory.memory.iter_long_term_json(session_id)
+        assert json.loads(body) == {"results": all_mem, "count": 2}
     
-    def test_short_term_memory(self):
+    def test_short_term_memory(self, session_id):
         """Test short-term (working) memory."""
-        session_id = self.memory.sessions.create("ShortTerm Test")
-        
         # Store short-term memory
         self.memory.memory.store_short_term(
             session_id,
@@ -167,15 +216,35 @@ class TestMemorySystemV2:
         assert len(stm['recent_actions']) == 3
         assert stm['recent_actions'][-1]['action'] == "test"
         
+        # Batched pushes apply in order with the same merge and trim rules
+        self.memory.memory.push_many(
+            [("action", session_id, {"action": f"batch{i}"}) for i in range(12)]
+            + [("context", session_id, {"batch": True})]
+        )
+        stm = self.memory.memory.get_short_term(session_id)
+        assert len(stm['recent_actions']) == 10
+        assert stm['recent_actions'][-1]['action'] == "batch11"
+        assert stm['active_context']['batch'] is True
+        assert stm['focus_area'] == "authentication"  # preserved
+        
+        # Single pushes trim to the same window
+        self.memory.memory.push_action(session_id, {"action": "last"})
+        stm = self.memory.memory.get_short_term(session_id)
+        assert [a['action'] for a in stm['recent_actions']][::9] == ["batch3", "last"]
+        
+        # Writes bump the memory store version, reads do not
+        version = self.memory.memory.version
+        self.memory.memory.get_short_term(session_id)
+        assert self.memory.memory.version == version
+        
         # Clear
         self.memory.memory.clear_short_term(session_id)
+        assert self.memory.memory.version > version
         stm = self.memory.memory.get_short_term(session_id)
         assert stm is None
     
-    def test_checkpoint_overall(self):
+    def test_checkpoint_overall(self, session_id):
         """Test overall session checkpoint."""
-        session_id = self.memory.sessions.create("Checkpoint Test")
-        
         # Setup tasks and memory
         task_id = self.memory.tasks.create_main_task(session_id, "Main Task")
         self.memory.tasks.update_progress(task_id, 0.5, "in_progress")
@@ -211,10 +280,11 @@ class TestMemorySystemV2:
         checkpoints = self.memory.checkpoints.list(session_id)
         assert len(checkpoints) == 1
         assert checkpoints[0]['checkpoint_id'] == cp_id
+        body = self.memory.checkpoints.iter_list_json(session_id)
+        assert json.loads(body) == {"checkpoints": checkpoints, "count": 1}
     
-    def test_checkpoint_subtask(self):
+    def test_checkpoint_subtask(self, session_id):
         """Test sub-task checkpoint."""
-        session_id = self.memory.sessions.create("Subtask CP Test")
         main_id = self.memory.tasks.create_main_task(session_id, "Main")
         sub_id = self.memory.tasks.create_subtask(session_id, main_id, "Subtask")
 
@@ -235,9 +305,8 @@ class TestMemorySystemV2:
         assert snapshot['task_details']['progress'] == 0.75
         assert snapshot['task_details']['status'] == 'in_progress'
     
-    def test_checkpoint_stage(self):
+    def test_checkpoint_stage(self, session_id):
         """Test stage checkpoint."""
-        session_id = self.memory.sessions.create("Stage CP Test")
         task_id = self.memory.tasks.create_main_task(session_id, "Task")
         
         self.memory.tasks.update_progress(task_id, 0.3, "in_progress")
@@ -258,10 +327,8 @@ class TestMemorySystemV2:
         assert snapshot['stage_name'] == 'design_phase'
         assert snapshot['current_state']['task']['progress'] == 0.3
     
-    def test_checkpoint_restore(self):
+    def test_checkpoint_restore(self, session_id):
         """Test checkpoint restoration."""
-        session_id = self.memory.sessions.create("Restore Test")
-        
         # Create initial state
         task_id = self.memory.tasks.create_main_task(session_id, "Task")
         self.memory.memory.store_long_term(
@@ -289,10 +356,13 @@ class TestMemorySystemV2:
         memories = self.memory.memory.retrieve_long_term(session_id)
         assert len(memories) == 1
         assert memories[0]['content']['data'] == "original"
+        
+        # Restoring again rewrites nothing that already matches
+        assert self.memory.checkpoints.restore(session_id, cp_id)
+        assert self.memory.memory.retrieve_long_term(session_id) == memories
     
-    def test_checkpoint_diff(self):
+    def test_checkpoint_diff(self, session_id):
         """Test checkpoint comparison."""
-        session_id = self.memory.sessions.create("Diff Test")
         task_id = self.memory.tasks.create_main_task(session_id, "Task")
         
         # First checkpoint
@@ -311,15 +381,17 @@ class TestMemorySystemV2:
         assert diff['checkpoint_1'] == cp1
         assert diff['checkpoint_2'] == cp2
         assert len(diff['changes']['tasks']) > 0
-        assert any("CHANGED" in change for change in diff['changes']['tasks'])
+        changes = diff['changes']['tasks']
+        assert {"op": "changed", "task_id": task_id, "field": "progress",
+                "old": 0.0, "new": 0.5} in changes
+        assert [c['op'] for c in changes].count("new") == 1
+        assert self.memory.checkpoints.format_change(changes[0]) == f"CHANGED: {task_id} 0.0 → 0.5"
     
-    def test_checkpoint_cleanup(self):
+    def test_checkpoint_cleanup(self, session_id):
         """Test old checkpoint cleanup."""
-        session_id = self.memory.sessions.create("Cleanup Test")
-        
         # Create multiple checkpoints
-        for i in range(15):
-            self.memory.checkpoints.create_overall(session_id, tags=[f"cp{i}"])
+        created = self.memory.checkpoints.create_many(session_id, [([f"cp{i}"], None) for i in range(15)])
+        assert len(set(created)) == 15
         
         # Cleanup (keep last 5)
         deleted = self.memory.checkpoints.cleanup_old(session_id, keep_last=5)
@@ -329,10 +401,44 @@ class TestMemorySystemV2:
         checkpoints = self.memory.checkpoints.list(session_id)
         assert len(checkpoints) == 5
     
-    def test_dependencies(self):
-        """Test task dependencies."""
-        session_id = self.memory.sessions.create("Dependency Test")
+    def test_checkpoint_delta(self, session_id):
+        """Test delta checkpoints rebuild fully and survive cleanup."""
+        task_id = self.memory.tasks.create_main_task(session_id, "Task")
+        self.memory.memory.store_long_term(session_id, "knowledge", {"data": "kept"})
+        
+        cp1 = self.memory.checkpoints.create_overall(session_id)
+        self.memory.tasks.update_progress(task_id, 0.5, "in_progress")
+        cp2 = self.memory.checkpoints.create_overall(session_id)
+        
+        # Only changed sections are stored for the second checkpoint
+        stored = self.memory.file_store.load_snapshot(cp2)
+        assert stored['delta_of'] == cp1
+        assert 'long_term_memory' not in stored['changes']
+        
+        snapshot = self.memory.checkpoints.get(cp2)['snapshot']
+        assert snapshot['tasks']['main_tasks'][0]['progress'] == 0.5
+        assert snapshot['long_term_memory'][0]['content']['data'] == "kept"
+        
+        # Deleting the parent turns the kept delta into a full snapshot
+        assert self.memory.checkpoints.cleanup_old(session_id, keep_last=1) == 1
+        assert 'delta_of' not in self.memory.file_store.load_snapshot(cp2)
+        assert self.memory.checkpoints.get(cp2)['snapshot'] == snapshot
+    
+    def test_checkpoint_reuses_unchanged_state(self, session_id, monkeypatch):
+        """Test repeated overall checkpoints skip rebuilding unchanged state."""
+        self.memory.tasks.create_main_task(session_id, "Task")
+        cp1 = self.memory.checkpoints.create_overall(session_id)
+        
+        with monkeypatch.context() as m:
+            m.setattr(self.memory.tasks, "get_tree", lambda *a, **k: pytest.fail("state was rebuilt"))
+            cp2 = self.memory.checkpoints.create_overall(session_id, metadata={"n": 2})
         
+        stored = self.memory.file_store.load_snapshot(cp2)
+        assert set(stored['changes']) == {'timestamp', 'metadata'}
+        assert self.memory.checkpoints.get(cp2)['snapshot']['tasks'] == self.memory.checkpoints.get(cp1)['snapshot']['tasks']
+    
+    def test_dependencies(self, session_id):
+        """Test task dependencies."""
         task1 = self.memory.tasks.create_main_task(session_id, "Task 1")
         task2 = self.memory.tasks.create_main_task(session_id, "Task 2")
         
@@ -344,10 +450,8 @@ class TestMemorySystemV2:
         deps = json.loads(task['dependencies'])
         assert task1 in deps
     
-    def test_stats(self):
+    def test_stats(self, session_id):
         """Test system statistics."""
-        session_id = self.memory.sessions.create("Stats Test")
-        
         for i in range(3):
             self.memory.tasks.create_main_task(session_id, f"Task {i}")
         
@@ -431,8 +535,68 @@ class TestMemorySystemV2:
         self.memory.checkpoints.restore(session_id, cp1)
         task = self.memory.tasks.get(ui)
         assert task['progress'] == 0.5  # Restored to 50%
+    
+    def test_non_str_keys(self, session_id):
+        """Test that dicts with non-str keys are stored with stringified keys."""
+        self.memory.memory.store_short_term(session_id, active_context={1: "x"})
+        assert self.memory.memory.get_short_term(session_id)['active_context'] == {"1": "x"}
         
-        print("✅ Full workflow test passed!")
+        cp_id = self.memory.checkpoints.create_overall(session_id, metadata={1: "x"})
+        assert self.memory.checkpoints.get(cp_id)['snapshot']['metadata'] == {"1": "x"}
+    
+    def test_big_ints(self, session_id):
+        """Test that ints beyond 64 bits are stored like json.dumps would."""
+        big = 2 ** 70 + 1
+        other = self.memory.sessions.create("Big Ints", {"n": big})
+        assert self.memory.sessions.get(other)['metadata'] == {"n": big}
+        
+        self.memory.memory.store_short_term(session_id, active_context={"n": big})
+        assert self.memory.memory.get_short_term(session_id)['active_context'] == {"n": big}
+        
+        cp_id = self.memory.checkpoints.create_overall(session_id, metadata={"n": big})
+        assert self.memory.checkpoints.get(cp_id)['snapshot']['metadata'] == {"n": big}
+    
+    def test_on_disk_persistence(self, tmp_path):
+        """Test that an on-disk store survives reopening."""
+        disk = MemorySystemV2(str(tmp_path))
+        session_id = disk.sessions.create("Disk Test")
+        cp_id = disk.checkpoints.create_overall(session_id)
+        disk.close()
+        
+        reopened = MemorySystemV2(str(tmp_path))
+        assert reopened.sessions.get(session_id)['name'] == "Disk Test"
+        assert reopened.checkpoints.get(cp_id) is not None
+        
+        # Pooled readers see committed writes and refuse to write
+        stats = reopened.get_stats()
+        assert reopened.db.run_read(reopened.get_stats) == stats
+        with pytest.raises(Exception):
+            reopened.db.run_read(reopened.sessions.create, "Read Only")
+        reopened.close()
+    
+    def test_in_memory_threads(self):
+        """Test that threads can share an in-memory store without lock errors."""
+        shared = MemorySystemV2(":memory:")
+        session_id = shared.sessions.create("Thread Test")
+        errors = []
+        
+        def work():
+            try:
+                for i in range(50):
+                    shared.tasks.create_main_task(session_id, f"Task {i}")
+                    shared.tasks.get_tree(session_id)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        assert len(shared.tasks.get_tree(session_id)['main_tasks']) == 200
+        shared.close()
 
 
 if __name__ == "__main__":